@@ -0,0 +1,270 @@
+"""
+TITLE: Matching benchmark (benchmark_matching.py)
+
+PURPOSE: Measures what our result matching costs, and how often it picks the right release, without making a single API call.
+
+USAGE:
+    python benchmark_matching.py                      # memory of a 5000-result basket, as old-style result dicts vs. compact candidates
+    python benchmark_matching.py --results 50000      # ...or a bigger basket
+    python benchmark_matching.py --songs 20           # score the basket for this many songs (default 10), to see what our match caches save
+
+    GOLDEN CORPUS: recorded Discogs search results for real filenames, each with the release we know is the right one
+    python benchmark_matching.py --record songs.txt --corpus golden.jsonl        # record one (needs DISCOGS_TOKEN; uses our cache & rate limiter like a normal run)
+    python benchmark_matching.py --corpus golden.jsonl                           # score it: accuracy, throughput & peak memory
+    python benchmark_matching.py --corpus golden.jsonl --save-picks before.json  # remember which release each song picked...
+    python benchmark_matching.py --corpus golden.jsonl --check-picks before.json # ...and after changing the scorer, list every song that now picks differently
+
+    songs.txt has one song per line:  {filename}<TAB>{the Discogs release id it should match}, i.e.
+        Lee Morse - Dallas Blues (1925).mp3	1234567
+    golden.jsonl then has one song per line:
+        {"filename": ..., "expected_release_id": ..., "queries": [{"params": {our query}, "pages": [[results of page 1], [results of page 2], ...]}, ...]}
+
+WHAT IS MEASURED:
+    * memory: a synthetic basket shaped like real Discogs search results is scored twice:
+        - "result dicts": every result copied into a dict with all our score & parse keys added, which is how we used to hold them
+        - "candidates"  : the compact Candidate objects we hold them as now
+      What gets counted is only what each approach keeps around on top of the basket itself, as measured by tracemalloc.
+    * scoring time: the same basket is scored a page at a time (like it arrives) for several songs in a row, first with plain
+      fuzz.token_set_ratio (every string normalized, tokenized & matched from scratch), then with our token & match caches.
+    * golden corpus: every song's recorded pages go through the very same streaming scorer a real run uses, and we report
+        - top-1 accuracy: how often the top result is the expected release, for each pass's formula
+        - tie accuracy  : how often the expected release is among the tied top results we take images from, for each pass's formula
+        - throughput    : candidates scored per second and songs per second
+        - peak memory   : the most tracemalloc saw in use while scoring the whole corpus
+"""
+
+import gc
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+import cover_downloader
+from fuzzywuzzy import fuzz
+
+RESULTS_PER_PAGE = 100                                #same as the search API gives us
+WORDS = ("lee morse dallas blues paul whiteman his orchestra charleston and the blue shadows one prince her boys "
+         "henry burr you forgot to remember fletcher henderson take back if she wants come ted lewis band").split()
+
+
+
+
+def make_basket(result_count, seed):                  #a basket shaped like what the search API gives us, with the same keys a real search result has
+    rng = random.Random(seed)
+    def words(count): return " ".join(rng.choice(WORDS) for _ in range(count)).title()
+    basket = []
+    for i in range(result_count):
+        release_id = rng.randint(1, 30000000)
+        title = f"{words(rng.randint(1, 3))} - {words(rng.randint(1, 4))}"
+        if rng.random() < 0.4: title += f" / {words(rng.randint(1, 4))}"
+        basket.append({
+            "country"     : rng.choice(["US", "UK", "Germany", "Canada"]),
+            "year"        : rng.choice(["1923", "1924", "1925", "1926", "1930", ""]),
+            "format"      : ["Shellac", '10"', "78 RPM"],
+            "label"       : [words(2), words(1)],
+            "type"        : "release",
+            "genre"       : ["Jazz"],
+            "style"       : ["Dixieland"],
+            "id"          : release_id,
+            "barcode"     : [],
+            "user_data"   : {"in_wantlist": False, "in_collection": False},
+            "master_id"   : 0,
+            "master_url"  : None,
+            "uri"         : f"/release/{release_id}-{title.replace(' ', '-')}",
+            "catno"       : f"{rng.randint(1000, 99999)}",
+            "title"       : title,
+            "thumb"       : f"https://i.discogs.com/thumb/R-{release_id}-{i}.jpeg",
+            "cover_image" : f"https://i.discogs.com/image/R-{release_id}-{i}.jpeg",
+            "resource_url": f"https://api.discogs.com/releases/{release_id}",
+            "community"   : {"want": rng.randint(0, 50), "have": rng.randint(0, 50)},
+        })
+    return basket
+
+
+SONGS = [("Paul Whiteman & His Orch", "Charleston"  , "1925", "Paul Whiteman", True ),
+         ("Lee Morse"               , "Dallas Blues", "1925", "Lee Morse"    , False),
+         ("Henry Burr"              , "You Forgot To Remember", "1925", "Henry Burr", False),
+         ("Fletcher Henderson & His Orch", "I'll Take Her Back If She Wants To Come Back", "1925", "Fletcher Henderson", True)]
+
+
+def make_song(number=0):
+    artist, title, year, artist_before_ampersand, artist_has_ands_or_amps = SONGS[number % len(SONGS)]
+    return cover_downloader.SongContext(f"{artist} - {title} ({year}).mp3", artist, title, year, artist_before_ampersand, artist_has_ands_or_amps)
+
+
+def retained_bytes(build):                            #how much memory whatever build() returns holds on to
+    gc.collect()
+    tracemalloc.start()
+    kept = build()
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return retained, len(kept)
+
+
+
+
+def benchmark_memory(result_count, seed, report):
+    basket = make_basket(result_count, seed)
+    song   = make_song()
+    cover_downloader.score_results(basket, song)                                 #warms up our match caches, so that neither measurement counts them
+    as_dicts,   count = retained_bytes(lambda: [candidate.as_dict() for candidate in cover_downloader.score_results(basket, song)])
+    as_compact, _     = retained_bytes(lambda: cover_downloader.score_results(basket, song))
+    report(f"* Memory held for a basket of {count} results, on top of the basket itself:")
+    report(f"      result dicts: {as_dicts   / 1024 / 1024:8.2f} MB ({as_dicts   / count:7.0f} bytes per result)")
+    report(f"        candidates: {as_compact / 1024 / 1024:8.2f} MB ({as_compact / count:7.0f} bytes per result)")
+    report(f"            saving: {(1 - as_compact / as_dicts) * 100:7.1f}%")
+    return as_dicts, as_compact
+
+
+def time_scoring(basket, song_count):
+    start = time.perf_counter()
+    for number in range(song_count):
+        song = make_song(number)
+        for page in range(0, len(basket), RESULTS_PER_PAGE): cover_downloader.score_results(basket[page:page + RESULTS_PER_PAGE], song)
+    return time.perf_counter() - start
+
+
+def benchmark_scoring(result_count, seed, song_count, report):
+    basket = make_basket(result_count, seed)
+    cached_token_set_ratio = cover_downloader.cached_token_set_ratio
+    cover_downloader.cached_token_set_ratio = fuzz.token_set_ratio                #what we'd be doing without our caches
+    try:     uncached = time_scoring(basket, song_count)
+    finally: cover_downloader.cached_token_set_ratio = cached_token_set_ratio
+    cover_downloader.token_set_of.cache_clear()
+    cover_downloader.cached_token_set_ratio.cache_clear()
+    cached = time_scoring(basket, song_count)
+    report(f"* Scoring a basket of {result_count} results, a page at a time, for {song_count} songs:")
+    report(f"        fuzz.token_set_ratio: {uncached:7.2f}s")
+    report(f"     our token/match cache: {cached:7.2f}s ({uncached / cached:.1f}x as fast, cache: {cover_downloader.cached_token_set_ratio.cache_info()})")
+    return uncached, cached
+
+
+
+
+def page_keeper(pages):                                             #a page scorer that only keeps each page it's given, in pages, so we can record them
+    def keep_page(page, page_results):
+        pages[page] = page_results
+        return -1, -1
+    return keep_page
+
+
+def record_corpus(songs_path, corpus_path, report):                 #runs our queries for each song against the live API, keeping every page we get back
+    cover_downloader.LOGFILE               = "benchmark_matching.log"
+    cover_downloader.EARLY_STOP_PAGINATION = False                  #the corpus needs every page, no matter how the scorer changes later
+    with open(songs_path, encoding="utf-8") as songs, open(corpus_path, "w", encoding="utf-8") as corpus:
+        for line in songs:
+            if not line.strip(): continue
+            filename, expected_release_id = line.rstrip("\n").split("\t")
+            artist, title, year = cover_downloader.parse_filename(filename)
+            recorded_queries = []
+            for query in cover_downloader.build_research_queries(artist, title, year)[0]:
+                pages = {}
+                cover_downloader.get_api_results(dict(query), [], None, page_scorer=page_keeper(pages))
+                recorded_queries.append({"params": query, "pages": [pages[page] for page in sorted(pages)]})
+            corpus.write(json.dumps({"filename": filename, "expected_release_id": int(expected_release_id), "queries": recorded_queries}) + "\n")
+            report(f"* Recorded {sum(len(page) for query in recorded_queries for page in query['pages'])} results for {filename}")
+    cover_downloader.close_api_cache()
+
+
+def load_corpus(corpus_path):
+    with open(corpus_path, encoding="utf-8") as corpus:
+        return [json.loads(line) for line in corpus if line.strip()]
+
+
+def score_song(song):                                               #the same streaming scorer a real run uses; returns (candidates, how many results were scored)
+    artist, title, year = cover_downloader.parse_filename(song["filename"])
+    _, title, year, artist_before_ampersand, artist_has_ands_or_amps = cover_downloader.build_research_queries(artist, title, year)
+    context    = cover_downloader.SongContext(song["filename"], artist, title, year, artist_before_ampersand, artist_has_ands_or_amps)
+    candidates = cover_downloader.TopCandidates(cover_downloader.MAX_TIED_RESULTS_TO_CHECK, lambda page_results: cover_downloader.score_results(page_results, context))
+    scored = 0
+    for query_index, query in enumerate(song["queries"]):
+        for page, page_results in enumerate(query["pages"], start=1):
+            candidates.offer(page_results, query_index, page, query["params"])
+            scored += len(page_results)
+    return candidates, scored
+
+
+def score_corpus(corpus):                                           #returns ({filename: {pass: (top release id, [tied release ids])}}, results scored)
+    picks, scored = {}, 0
+    for song in corpus:
+        candidates, song_scored = score_song(song)
+        scored += song_scored
+        picks[song["filename"]] = {}
+        for pass_num, score_name in ((1, "score"), (2, "score_2")):
+            ranked = candidates.ranked(score_name)
+            picks[song["filename"]][pass_num] = (ranked[0]["id"] if ranked else None, [result["id"] for result in cover_downloader.tied_top_results(ranked)])
+    return picks, scored
+
+
+def benchmark_corpus(corpus_path, report, save_picks=None, check_picks=None):
+    corpus = load_corpus(corpus_path)
+    if not corpus:
+        report(f"* {corpus_path} has no songs in it")
+        return None
+
+    cover_downloader.token_set_of.cache_clear()
+    cover_downloader.cached_token_set_ratio.cache_clear()
+    start = time.perf_counter()
+    picks, scored = score_corpus(corpus)
+    elapsed = time.perf_counter() - start
+
+    cover_downloader.token_set_of.cache_clear()                     #tracemalloc slows everything down, so peak memory gets its own run
+    cover_downloader.cached_token_set_ratio.cache_clear()
+    gc.collect()
+    tracemalloc.start()
+    score_corpus(corpus)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    report(f"* Golden corpus: {len(corpus)} songs, {scored} results scored")
+    report(f"        throughput: {scored / elapsed:10.0f} candidates/sec, {len(corpus) / elapsed:8.1f} songs/sec")
+    report(f"       peak memory: {peak / 1024 / 1024:10.2f} MB while scoring")
+    for pass_num in (1, 2):
+        top_1 = sum(1 for song in corpus if picks[song["filename"]][pass_num][0] == song["expected_release_id"])
+        tied  = sum(1 for song in corpus if song["expected_release_id"] in picks[song["filename"]][pass_num][1])
+        report(f"      pass {pass_num} top-1: {top_1 / len(corpus) * 100:6.1f}% ({top_1}/{len(corpus)})      tie: {tied / len(corpus) * 100:6.1f}% ({tied}/{len(corpus)})")
+
+    if save_picks:
+        with open(save_picks, "w", encoding="utf-8") as picks_file: json.dump(picks, picks_file, indent=1)
+        report(f"* Saved every song's picks to {save_picks}")
+    if check_picks:
+        with open(check_picks, encoding="utf-8") as picks_file: before = json.load(picks_file)
+        picks   = json.loads(json.dumps(picks))                     #so they look just like the ones we saved
+        changed = [filename for filename in picks if before.get(filename) != picks[filename]]
+        report(f"* {len(changed)} of {len(picks)} songs pick differently than in {check_picks}" + (":" if changed else ""))
+        for filename in changed: report(f"        {filename}")
+    return picks
+
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks our result matching, without any API calls.")
+    parser.add_argument("--results", type=int, default=5000, help="how many results in the synthetic basket (default: 5000)")
+    parser.add_argument("--seed"   , type=int, default=1925, help="seed for the synthetic basket, so runs can be compared")
+    parser.add_argument("--songs"  , type=int, default=10  , help="how many songs to score the basket for when timing (default: 10)")
+    parser.add_argument("--corpus" , help="a golden corpus to benchmark (or to record into, with --record)")
+    parser.add_argument("--record" , help="songs to record a golden corpus for, one '{filename}<TAB>{expected release id}' per line")
+    parser.add_argument("--save-picks" , help="with --corpus: save which release each song picked to this file")
+    parser.add_argument("--check-picks", help="with --corpus: compare which release each song picked against a file from --save-picks")
+    args = parser.parse_args()
+
+    report = cover_downloader.original_print                 #cover_downloader doesn't let anyone use print
+    if args.record:
+        if not args.corpus: parser.error("--record needs --corpus to say where to record to")
+        record_corpus(args.record, args.corpus, report)
+        return 0
+    if args.corpus:
+        if not os.path.exists(args.corpus): parser.error(f"no golden corpus at {args.corpus}")
+        benchmark_corpus(args.corpus, report, save_picks=args.save_picks, check_picks=args.check_picks)
+        return 0
+    benchmark_memory(args.results, args.seed, report)
+    benchmark_scoring(args.results, args.seed, args.songs, report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
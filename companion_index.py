@@ -0,0 +1,103 @@
+"""
+TITLE: Companion image index (companion_index.py)
+
+PURPOSE: Answers "which images go with this song?" for a whole folder from a single directory scan.
+         Checking every possible companion filename one by one (2 base names x ~1,000 suffixes x 4 extensions per song)
+         meant tens of millions of stat calls for a big folder, before any real work even began.
+
+USAGE:
+    index = CompanionIndex(".")                                   #one os.scandir pass over the folder
+    index.has_companion("Lee Morse - Dallas Blues (1925).mp3")    #cover_downloader.py: skip songs that already have art
+    index.companion_images("Lee Morse - Dallas Blues (1925).mp3") #cover_embedder.py: which art to embed
+    index.family("Lee Morse - Dallas Blues (1925).mp3")           #wedding_party.py: the song & everything that goes with it
+
+WHAT COUNTS AS A COMPANION:
+    * an image (.jpg .jpeg .png .webp) named after the song, plus an optional A / B / C / B1, B2, ... suffix
+      i.e. "Lee Morse - Dallas Blues (1925)B1.jpg" -- the A & B sides that cover_downloader.py downloads
+    * ...or named after the song minus its last character, which has been seen happening in the wild
+    * ...and that isn't zero bytes, which is what a failed download leaves behind
+"""
+
+import os
+import re
+import collections
+
+IMAGE_EXTENSIONS  = (".jpg", ".jpeg", ".png", ".webp")
+AUDIO_EXTENSIONS  = (".mp3", ".flac")
+DOUBLE_EXTENSIONS = (".jpg.jpg",)                                                    #what a download sometimes ends up named; never a companion, but it gets married off with the song anyway
+KNOWN_EXTENSIONS  = sorted(IMAGE_EXTENSIONS + AUDIO_EXTENSIONS + DOUBLE_EXTENSIONS, key=len, reverse=True)    #longest first, so ".jpg.jpg" wins over ".jpg"
+SUFFIX_LETTERS    = {os.path.normcase(letter): letter for letter in "ABC"}          #normcase, so that "songb.jpg" is side B of "song.mp3" wherever the filesystem thinks so
+NUMBERED_SUFFIX   = re.compile(r"[Bb][1-9]\d*$")
+
+CompanionFile = collections.namedtuple("CompanionFile", "name suffix extension size")
+
+
+def split_name(name):                        #"SongB1.jpg" -> ("SongB1", ".jpg"), or None if it isn't a kind of file we care about
+    lowered = name.lower()
+    for extension in KNOWN_EXTENSIONS:
+        if lowered.endswith(extension): return name[:-len(extension)], extension
+    return None
+
+
+def possible_suffixes(stem):                 #every way of reading a name as base + suffix: "SongB1" could be song "SongB1", or song "Song" side B1
+    yield "", stem
+    letter = SUFFIX_LETTERS.get(os.path.normcase(stem[-1:]))
+    if letter: yield letter, stem[:-1]
+    numbered = NUMBERED_SUFFIX.search(stem)
+    if numbered and os.path.normcase(numbered.group()[0]) == os.path.normcase("B"): yield "B" + numbered.group()[1:], stem[:numbered.start()]
+
+
+def suffix_order(suffix):                    #"" first, then A, B, B1, B2, ... B10, then C
+    return suffix[:1], int(suffix[1:] or 0)
+
+
+
+
+class CompanionIndex:
+    """
+    Every audio file & image in one folder, found with a single os.scandir pass, and filed under each song base name
+    it could belong to.  Names are matched the way the filesystem matches them (case-insensitively on Windows), extensions in any case.
+    """
+
+    def __init__(self, folder="."):
+        self.folder   = folder
+        self.audio    = []                                                           #audio filenames, in directory order
+        self.by_base  = collections.defaultdict(list)                                #normcased base name -> [CompanionFile]
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                split = split_name(entry.name)
+                if split is None or not entry.is_file(): continue
+                stem, extension = split
+                size = entry.stat().st_size                                          #free on Windows, where scandir already has it
+                for suffix, base in possible_suffixes(stem):
+                    if base: self.by_base[os.path.normcase(base)].append(CompanionFile(entry.name, suffix, extension.lower(), size))
+                if extension.lower() in AUDIO_EXTENSIONS: self.audio.append(entry.name)
+
+    def audio_files(self, extensions=AUDIO_EXTENSIONS):
+        return [name for name in self.audio if name.lower().endswith(tuple(extensions))]
+
+    def files_for(self, base):               #every file filed under this base name, whatever its suffix
+        return self.by_base.get(os.path.normcase(base), [])
+
+    def companion_images(self, audio_filename, extensions=IMAGE_EXTENSIONS):
+        #the non-empty images that go with this song, best first; the truncated base name is only a fallback
+        base = os.path.splitext(os.path.basename(audio_filename))[0]
+        for base_to_use in (base, base[:-1]):
+            images = [companion for companion in self.files_for(base_to_use) if companion.extension in extensions and companion.size > 0]
+            if images: return [image.name for image in sorted(images, key=lambda image: (suffix_order(image.suffix), extensions.index(image.extension)))]
+        return []
+
+    def has_companion(self, audio_filename):
+        return bool(self.companion_images(audio_filename))
+
+    def is_song(self, base):                 #whether there's an audio file by exactly this base name
+        return any(companion.suffix == "" and companion.extension in AUDIO_EXTENSIONS for companion in self.files_for(base))
+
+    def family(self, audio_filename):        #the song itself, its companion images, and any other audio or images sharing its base name, i.e. for moving them all together
+        #plus the images filed under its truncated base name, which is where the downloader's "A" & "B1" images for a song
+        #ending in a letter end up ("Moonlight.mp3" -> "MoonlighA.jpg"), unless that name is another song's
+        base    = os.path.splitext(os.path.basename(audio_filename))[0]
+        members = {companion.name for companion in self.files_for(base)}
+        if base[:-1] and not self.is_song(base[:-1]):
+            members.update(companion.name for companion in self.files_for(base[:-1]) if companion.extension in IMAGE_EXTENSIONS + DOUBLE_EXTENSIONS)
+        return sorted(members)
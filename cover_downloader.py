@@ -49,9 +49,10 @@ USAGE:
 LITTLE UNNOTICED FEATURES:
     * Caching of redundant API calls along with statkeeping so we know how much we saved.
       Basically, multiple songs by the same artist translate to an increased successful caching frequency.
+      The cache is persisted to get-art.cache.sqlite, so re-runs of the same folder are mostly served from disk instead of from Discogs.
     * The Discogs API is NOT straightforward!
         * Only 100 results per request, so pagination is used
-        * Only 60 requests per hour, so headers are examined to monitor remaining requests allowed, with lots of throttling pauses
+        * Only 60 requests per minute, so headers are examined to monitor remaining requests allowed, and a token-bucket rate limiter spaces our requests out to stay just under that
         * Thousands of calls are made, so caching is employed. It hits about 5-10% of the time depending on your input data.
         * Discog searches are wonky and only the most exact matches all the way through the process will find what we want, like 5% of the time.
           So we must employ fuzzier methods. We research our music approximately 10 ways:
@@ -78,15 +79,38 @@ POTENTIAL BUGS:
 
 """
 
+import io
 import os
 import re
 import sys
+import gzip
+import json
 import time
+import queue
+import atexit
+import shutil
+import heapq
+import pstats
+import cProfile
+import sqlite3
+import argparse
 import builtins
+import functools
+import contextlib
+import itertools
+import threading
+import tracemalloc
+import collections
+import concurrent.futures
 import requests
+from requests.adapters import HTTPAdapter
 from fuzzywuzzy import fuzz
+from fuzzywuzzy import utils as fuzz_utils
 from unidecode import unidecode
 from colorama import Fore, Style, init
+import discogs_dump
+import discogs_replay
+import companion_index
 init()
 
 # Options that would rarely be changed
@@ -102,19 +126,66 @@ THROTTLE_TIME_BETWEEN_RESEARCH = 0.1       #how long to wait before investigatin
 THROTTLE_TIME_NO_RELEASE_FOUND = 8         #how long to wait if no release found on discogs -- this isn't about API rate limiting but letting the user notice the problem
 
 # Options that probably shouldn't change
-THROTTLE_MIN_REQ_TO_HAVE_READY = 7         #definitely seen it get down to 2 even when set to 5; There was a time where not every API call was throttled which increased paranoia.
+RATE_LIMIT_PER_MINUTE          = 60        #what we assume Discogs allows us until its X-Discogs-Ratelimit header tells us otherwise
+RATE_LIMIT_SAFETY_MARGIN       = 2         #stay this many requests-per-minute under the advertised limit, so we run "just under" it instead of bumping into it
+RATE_LIMIT_BURST               = 3         #how many requests the token bucket lets through back-to-back after a quiet spell; low values space the calls out evenly
 MAXIMUM_RESEARCH_ATTEMPTS      = 5         #how many times to perform out full set of research, if things don't work out. In practice it should never actually happen more than once; this is just in case.
 REQUEST_TIMEOUT                = 120       #how long to let a requests.get languish; without one, it can be a permanent hang
-DOWNLOAD_INTERNALLY            = False     #set to true (at your own risk) to attempt download the art internally, but it's untested and not how this is meant to be run. besides, it may be preferable to create a BAT to downoad with WGET so that you aren't hammering Discogs.com so much at the same time. This will probably break the script but if someone wants to make that part work, be my guest!
+DOWNLOAD_INTERNALLY            = False     #set to True to download the art ourselves, as we go, instead of leaving it to get-art.bat & wget (see IMAGE_* below)
+WRITE_DOWNLOAD_SCRIPT          = True      #write get-art.bat, for downloading the art with wget; optional once DOWNLOAD_INTERNALLY is on, but handy for re-downloading later
+IMAGE_DOWNLOAD_THREADS         = 4         #when downloading internally: how many images may be downloading at once
+IMAGE_RATE_LIMIT_PER_MINUTE    = 30        #...how many images a minute we fetch from Discogs' image host; a budget of its own, separate from our API calls [get-art.bat's 2-second pauses come to 30]
+IMAGE_DOWNLOAD_RETRIES         = 4         #...how many more times to try an image that failed to download, before giving up on it
+IMAGE_RETRY_BACKOFF_SECONDS    = 2         #...how long to wait before the first retry; it doubles with each retry after that
+SEARCH_BACKEND                 = "api"     #"api" to search Discogs live, or "dump" to search a local index built from the Discogs data dump by discogs_dump.py (the API is then only used for release data & images)
+DISCOGS_DUMP_INDEX             = discogs_dump.DEFAULT_INDEX_FILE                                                                    #where that local index lives
 PAGINATION_SUPPORT             = True      #keep as true, set to False to run faster at the expense of more mismatches
+RESEARCH_THREADS               = 4         #how many of our research queries may be in flight at once (the rate limiter still decides how fast requests actually go out)
+PAGE_THREADS                   = 4         #how many pages of one query may be in flight at once
+RELEASE_DATA_THREADS           = 4         #how many release lookups (for tied B-side results) may be in flight at once
+RELEASE_DATA_CACHE_SIZE        = 2000      #how many releases' data to keep in memory, keyed by release id
+TOKEN_CACHE_SIZE               = 100000    #how many distinct strings' normalized fuzzy-matching tokens to keep in memory (the same artists show up in thousands of results)
+MATCH_CACHE_SIZE               = 200000    #how many fuzzy-match scores of one string against another to keep in memory (i.e. our artist vs. the same Discogs artist, page after page, song after song)
+HTTP_POOL_CONNECTIONS          = 4         #how many different hosts our HTTP session keeps connection pools for (api.discogs.com, i.discogs.com, ...)
+HTTP_POOL_SIZE                 = 16        #how many keep-alive connections per host; should be at least RESEARCH_THREADS * PAGE_THREADS so nobody has to wait for a connection
+PIPELINE_SONGS_IN_FLIGHT       = 4         #how many songs may be researched at the same time; set to 1 to process one song at a time, start to finish, like we used to
+API_CACHE_TTL_DAYS_SEARCH      = 14        #how many days a persisted search result is trusted before we ask Discogs again
+API_CACHE_TTL_DAYS_RELEASE     = 90        #how many days persisted release data is trusted before we ask Discogs again (releases change far less often than search results)
+API_CACHE_MAX_ENTRIES          = 250000    #size cap for the persistent cache; least-recently-used entries get evicted once we go over this
+API_CACHE_MEMORY_RESULTS       = 20000     #size cap for the in-memory front of that cache, in results: a page of search results counts as every result on it (up to 100), release data as one. Everything else stays in SQLite
+API_CACHE_UPKEEP_EVERY         = 500       #check the persistent cache's size cap (and write out when its entries were last used) every this many writes, and when we close it, rather than on every single write
+EARLY_STOP_PAGINATION          = False     #set to True to score each page as it arrives and stop paging a query once we have a perfect score in both passes' formulas, or after EARLY_STOP_PATIENCE pages without a better one (there's no cheaper bound on what a later page could score) -- saves lots of API calls on big artist searches, at a small risk of missing a deep match
+EARLY_STOP_PATIENCE            = 3         #...how many pages in a row without a better score before we give up on a query
+DISCOGS_TRAFFIC                = "live"    #"live" to talk to Discogs, "record" to also save every request & response into DISCOGS_FIXTURES, or "replay" to answer from there instead, with no network or token needed (see discogs_replay.py)
+DISCOGS_FIXTURES               = discogs_replay.DEFAULT_FIXTURE_FILE                                                                #where those recorded requests & responses live
+REPLAY_SERVER_URL              = None      #when replaying: None to replay in-process, or i.e. "http://127.0.0.1:8765" to go through the stand-in server that "python discogs_replay.py" starts
+REPLAY_LATENCY_SECONDS         = 0         #when replaying in-process: how long each response takes, give or take half
+REPLAY_RATE_LIMIT              = 60        #...how many requests a minute are allowed before we get a 429, like Discogs does
+REPLAY_CHANCE_OF_429           = 0         #...and the chance of any request getting a 429 anyway, i.e. 0.05, to see how we cope
+LOG_FLUSH_SECONDS              = 1         #our logfile is written by a background thread; this is how often it makes sure what it has written is actually on disk (it always does at exit, too)
+LOG_ROTATE_MB                  = 0         #once get-art.log gets this big, carry on in a fresh one, keeping the full ones as get-art.log.001, .002, etc (0 to never rotate)
+LOG_GZIP_ROTATED               = False     #set to True to gzip those full ones, since logs shrink to about a tenth of their size
+TRACE_RUN                      = False     #set to True to also write a JSONL record of every song, query & API call (timings, cache hits, throttling, scores) into get-art.trace.jsonl, for "python trace_summary.py" to make sense of
+PROFILE_RUN                    = False     #set to True (or run with --profile) to time our main stages and report where the time went: network, sleeping, scoring, logging, etc
+PROFILE_SONG                   = None      #set to part of a filename, i.e. "Dallas Blues" (or run with --profile-song "Dallas Blues"), to also capture cProfile & tracemalloc while researching that song
+PLAN_LIBRARY_QUERIES           = True      #fetch every distinct query in the whole folder once, up front, so songs by the same artist don't each repeat the same artist searches
+JOURNAL_SONGS                  = True      #checkpoint every finished song (what we parsed, asked, chose & downloaded) into get-art.journal.jsonl, so a run that gets killed partway can pick up where it stopped
+RESUME_INTERRUPTED_RUN         = True      #...if the last run never finished, don't research the songs it did finish again; just replay their downloads (set to False, or run with --fresh, to start over)
+RESUME_RETRY_FAILURES          = False     #...but do research the songs it found nothing for again (or run with --retry-failures)
 
 # Constants
+BEST_POSSIBLE_SCORE   = (100 * 1 ) + (100 * 3 ) + (100 * 2)                                                                         #a perfect score under our 1st-pass formula in score_results()
+BEST_POSSIBLE_SCORE_2 = (100 * 10) + (100 * 30)                                                                                     #a perfect score under our 2nd-pass formula in score_results()
 DISCOGS_TOKEN   = os.getenv("DISCOGS_TOKEN")
 DISCOGS_API_URL = "https://api.discogs.com/database/search"
 HEADERS         = {"Authorization": f"Discogs token={DISCOGS_TOKEN}",
                    "User-Agent"   :  "Discogs Classics Cover Collector (CoverDownloader.py)/1.5 (ClioCJS@gmail.com)"}                   #official version number is here, fwiw
 DOWNLOAD_SCRIPT = "get-art.bat"
 LOGFILE         = "get-art.log"
+PROFILE_FILE    = "get-art.profile"                                                                                                 #song profiles go into i.e. "get-art.profile - Lee Morse - Dallas Blues (1925).pstats" and .txt
+TRACE_FILE      = "get-art.trace.jsonl"                                                                                             #our trace, when TRACE_RUN is on
+JOURNAL_FILE    = "get-art.journal.jsonl"                                                                                           #our checkpoint journal, when JOURNAL_SONGS is on
+API_CACHE_FILE  = "get-art.cache.sqlite"                                                                                            #persistent API cache, so that re-running the same folder (which we do ~3 times) doesn't re-pay the whole Discogs cost
 
 # Globals: OS
 IS_WINDOWS = True
@@ -125,8 +196,22 @@ OUR_SHELL  = "Unknown"
 # Globals: API
 API_CALLS_MADE             = 0
 API_CALLS_SAVED_BY_CACHING = 0
+API_CALLS_REVALIDATED      = 0              #calls that Discogs answered with "304 Not Modified" for data we already had
 THROTTLE_API_CALLS_LEFT    = 999
-API_CACHE                  = {}
+PAGES_SKIPPED_EARLY        = 0              #pages we didn't bother fetching because EARLY_STOP_PAGINATION decided they wouldn't help
+DUPLICATE_RESULTS_MERGED   = 0              #results we didn't have to score again because another of the same song's queries had already found that release
+STATS_LOCK                 = threading.Lock()   #our research runs in several threads at once, so our counters need a lock
+RESEARCH_EXECUTOR          = concurrent.futures.ThreadPoolExecutor(max_workers=RESEARCH_THREADS, thread_name_prefix="research")
+RELEASE_DATA_EXECUTOR      = concurrent.futures.ThreadPoolExecutor(max_workers=RELEASE_DATA_THREADS, thread_name_prefix="release")
+RELEASE_DATA_FUTURES       = collections.OrderedDict()  #release id (or resource_url) -> future of its release data, in least-recently-used order
+RELEASE_DATA_LOCK          = threading.Lock()
+PAGE_EXECUTOR              = concurrent.futures.ThreadPoolExecutor(max_workers=PAGE_THREADS    , thread_name_prefix="page"    )   #separate from RESEARCH_EXECUTOR so a query never waits on a pool its own siblings are hogging
+API_CACHE                  = collections.OrderedDict()  #in-memory front of our persistent cache, in least-recently-used order
+API_CACHE_MEMORY_SIZE      = 0              #how many results that in-memory front holds right now
+API_CACHE_DB               = None           #sqlite connection to our persistent cache, opened lazily
+API_CACHE_LOCK             = threading.Lock()
+API_CACHE_TOUCHED          = {}             #cache key -> when our persistent cache last answered for it, written out at our next upkeep, so a cache hit never has to write
+API_CACHE_WRITES           = 0              #writes to our persistent cache since its last upkeep
 CACHE_HITS                 = 0
 
 # Globals: Download tracking
@@ -134,11 +219,126 @@ IMAGES_FOUND         = 0
 RESULTS_FOUND        = 0
 DOWNLOADED_URLS      = set()                    #to keep track of downloaded URLs      so we don't download from the same URL      more than once
 DOWNLOADED_FILENAMES = set()                    #to keep track of downloaded filenames so we don't download to   the same filename more than once
+SONGS_RESUMED        = 0                        #songs an interrupted run had already finished, so we replayed them from our journal instead of researching them
 file                 = None
-
-
-
-
+SONG_CONTEXT         = threading.local()        #per-song-worker state, i.e. the downloads a song has found but not yet written to our download script
+
+# Globals: Profiling
+PROFILE_TOTALS       = {}                       #stage -> [calls, seconds, seconds not spent in any stage inside it]
+PROFILE_TIMERS       = threading.local()        #each thread's stack of stages currently being timed
+PROFILE_CATEGORIES   = {"network"        : "network" , "rate_limiter"   : "sleeping", "throttle_sleep"     : "sleeping",
+                        "score_results"  : "scoring" , "rank_results"   : "scoring" , "keep_top_candidates": "scoring",
+                        "display_results": "logging" , "primt"          : "logging" , "api_cache_get"      : "cache"   , "api_cache_put": "cache",
+                        "parse_filename" : "parsing" , "get_api_results": "waiting"}   #what kind of time each stage's own time is; get_api_results mostly waits on its page threads
+
+
+
+
+
+
+
+
+##### Profiling: cheap timers around our main stages, and cProfile & tracemalloc for one chosen song
+
+@contextlib.contextmanager
+def profile_timer(stage):                                                                           #times the with-block as one stage of our profile; time in stages inside it only counts for those
+    if not PROFILE_RUN:
+        yield
+        return
+    timers  = PROFILE_TIMERS.__dict__.setdefault("stack", [])
+    started = time.perf_counter()
+    timers.append(0)                                                                                #how long stages inside this one took
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        inner   = timers.pop()
+        if timers: timers[-1] += seconds
+        with STATS_LOCK:
+            totals     = PROFILE_TOTALS.setdefault(stage, [0, 0, 0])
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] += seconds - inner
+
+
+def profiled(stage):                                                                                #decorator: every call of the function is timed as one stage of our profile
+    def decorate(function):
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            if not PROFILE_RUN: return function(*args, **kwargs)
+            with profile_timer(stage): return function(*args, **kwargs)
+        return timed
+    return decorate
+
+
+def throttle_sleep(seconds, trace=None):                                                            #every deliberate pause of ours goes through here, so our trace & profile can count them
+    with traced_stage("throttle", trace), profile_timer("throttle_sleep"): time.sleep(seconds)
+
+
+def profile_report():                                                                               #where the time went, stage by stage, and by what kind of time it was
+    if not PROFILE_RUN or not PROFILE_TOTALS: return
+    primt(f"\n{Fore.CYAN}{Style.BRIGHT}* Profile, in thread-seconds (several threads work at once, so these add up to more than the time elapsed):{Style.NORMAL}")
+    primt(f"{Fore.CYAN}    {'stage':<20} {'calls':>8} {'total':>10} {'own':>10} {'per call':>10}")
+    for stage, (calls, seconds, own) in sorted(PROFILE_TOTALS.items(), key=lambda item: item[1][2], reverse=True):
+        primt(f"{Fore.CYAN}    {stage:<20} {calls:>8} {seconds:>9.2f}s {own:>9.2f}s {1000 * seconds / calls:>8.2f}ms")
+    split = collections.Counter()
+    for stage, (_, _, own) in PROFILE_TOTALS.items(): split[PROFILE_CATEGORIES.get(stage, "other")] += own
+    total = sum(split.values()) or 1
+    primt(f"{Fore.CYAN}{Style.BRIGHT}* Time split: " + ", ".join(f"{category} {seconds:.1f}s ({100 * seconds / total:.0f}%)" for category, seconds in split.most_common()) + Style.NORMAL)
+
+
+class SongProfile:
+    """
+    cProfile & tracemalloc for one song's research.  Its work runs in several threads, and each piece of it gets a profiler
+    of its own, which are all added up in the end.  Memory is traced for the whole process, so with songs researched at the
+    same time, the other songs' allocations show up too.
+    """
+
+    tracing = 0                                                                                     #how many songs are having their memory traced right now
+    lock    = threading.Lock()
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.profiles = []
+        with SongProfile.lock:
+            if not SongProfile.tracing: tracemalloc.start()
+            SongProfile.tracing += 1
+        self.snapshot = tracemalloc.take_snapshot()
+
+    def run(self, function, *args, **kwargs):
+        profile = cProfile.Profile()
+        with SongProfile.lock: self.profiles.append(profile)
+        return profile.runcall(function, *args, **kwargs)
+
+    def finish(self):                                                                               #writes our .pstats (for i.e. snakeviz) and a readable .txt
+        memory_growth = tracemalloc.take_snapshot().compare_to(self.snapshot, "lineno")
+        _, peak       = tracemalloc.get_traced_memory()
+        with SongProfile.lock:
+            SongProfile.tracing -= 1
+            if not SongProfile.tracing: tracemalloc.stop()
+        profile_name = f"{PROFILE_FILE} - {os.path.splitext(self.filename)[0]}"
+        report = io.StringIO()
+        stats  = pstats.Stats(*self.profiles, stream=report)
+        stats.dump_stats(f"{profile_name}.pstats")
+        stats.sort_stats("cumulative")
+        report.write(f"{stats.total_calls} function calls ({stats.prim_calls} primitive calls) in {stats.total_tt:.3f} seconds, top 40 by cumulative time:\n\n")
+        report.write(f"{'ncalls':>12} {'tottime':>9} {'percall':>9} {'cumtime':>9} {'percall':>9}  filename:lineno(function)\n")
+        for function in stats.fcn_list[:40]:                                                        #stats.print_stats() would do this, but with print(), which we don't allow, and can't safely un-forbid while other threads are running
+            primitive_calls, calls, own_time, cumulative_time, _ = stats.stats[function]
+            report.write(f"{calls if calls == primitive_calls else f'{calls}/{primitive_calls}':>12} {own_time:>9.3f} {own_time / max(calls, 1):>9.3f} {cumulative_time:>9.3f} "
+                         f"{cumulative_time / max(primitive_calls, 1):>9.3f}  {pstats.func_std_string(function)}\n")
+        report.write(f"\nMemory: peak of {peak / 1024 / 1024:.1f}MB traced, and where it grew the most while researching this song:\n")
+        for growth in memory_growth[:20]: report.write(f"    {growth}\n")
+        with open(f"{profile_name}.txt", "w", encoding='utf-8') as profile_file: profile_file.write(report.getvalue())
+        LOG_WRITER.write(report.getvalue())                                                         #into our log too, but not onto the screen
+        primt(f"{Fore.CYAN}{Style.BRIGHT}* Profiled {self.filename}: {stats.total_calls} function calls in {stats.total_tt:.2f}s, across {len(self.profiles)} pieces of work handed to our threads, "
+              + f"peak memory {peak / 1024 / 1024:.1f}MB. Details in \"{profile_name}.txt\" & .pstats{Style.NORMAL}")
+
+
+def run_for_song_profile(function, *args, **kwargs):                                               #runs function under our song's profiler, if the song this thread works for is being profiled
+    song_profile = getattr(SONG_CONTEXT, "profile", None)
+    if song_profile is None: return function(*args, **kwargs)
+    return song_profile.run(function, *args, **kwargs)
 
 
 
@@ -151,6 +351,7 @@ def print_error(*args, called_from_primt=False, **kwargs):
 original_print = print                                      # Store the original print function before overriding
 builtins.print = print_error                                # Override the built-in print function with the custom one
 
+@profiled("primt")
 def primt(*args, **kwargs):     #custom_print "prim print" function to print, prim and proper, to screen & logfile at the same time
     global LOGFILE
 
@@ -164,14 +365,245 @@ def primt(*args, **kwargs):     #custom_print "prim print" function to print, pr
     output = " ".join(map(str, new_args))
 
     original_print(output, **kwargs)                                    # Call the original print function that we saved before
-    with open(LOGFILE, "a", encoding='utf-8') as log_file:
-        log_file.write(f"{strip_ansi_codes(output)}\n")
+    LOG_WRITER.write(output)                                            # ...and our background log writer takes it from there, so we never wait on the disk
 
 def strip_ansi_codes(text):
     if not hasattr(strip_ansi_codes, "ansi_escape"):                                            #recompiling this regex every darnded print...
         strip_ansi_codes.ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')     #...statement would have been very inefficient
     return strip_ansi_codes.ansi_escape.sub('', text)
 
+class LogWriter:
+    """
+    Writes our logfile from a background thread, so that primt never waits on the disk.  Lines pile up in a queue, get
+    written in batches to one long-lived buffered handle, and anything still queued gets written out at exit, even after a crash.
+    """
+
+    def __init__(self, flush_seconds=1, rotate_bytes=0, gzip_rotated=False, logfile=lambda: LOGFILE):
+        self.logfile       = logfile                      #returns which file to write to, which can change between runs
+        self.flush_seconds = flush_seconds
+        self.rotate_bytes  = rotate_bytes
+        self.gzip_rotated  = gzip_rotated
+        self.queue         = queue.SimpleQueue()          #lines to write, and Events from whoever is waiting for them to be written
+        self.handle        = None
+        self.handle_path   = None
+        self.thread        = None
+        self.lock          = threading.Lock()
+
+    def write(self, line):
+        if self.thread is None: self.start()
+        self.queue.put(line)
+
+    def release(self):                                    #returns once everything queued so far is on disk and the logfile is let go of (i.e. so it can be renamed)
+        if self.thread is None: return
+        written = threading.Event()
+        self.queue.put(written)
+        written.wait()
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None: return
+            self.thread = threading.Thread(target=self.run, name="log-writer", daemon=True)
+            self.thread.start()
+            atexit.register(self.release)
+
+    def run(self):
+        last_flush = time.monotonic()
+        while True:
+            lines, waiting = [], []
+            try:
+                item = self.queue.get(timeout=self.flush_seconds)
+                while True:                                                                         #take everything that has piled up, as one batch
+                    if isinstance(item, str): lines  .append(item)
+                    else:                     waiting.append(item)
+                    item = self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                if lines: self.write_lines(lines)
+                if self.handle is not None and (waiting or time.monotonic() - last_flush >= self.flush_seconds):
+                    self.handle.flush()
+                    last_flush = time.monotonic()
+                if waiting: self.close_handle()
+            except OSError as exception:                                                            #i.e. disk full -- not worth taking the whole run down over
+                original_print(f"** Couldn't write to {self.logfile()}: {exception}", file=sys.stderr)
+                self.handle = None
+            for written in waiting: written.set()
+
+    def write_lines(self, lines):
+        if self.handle_path != self.logfile(): self.close_handle()                                  #somebody pointed us at a different logfile
+        if self.handle is None:
+            self.handle_path = self.logfile()
+            self.handle      = open(self.handle_path, "a", encoding='utf-8', buffering=1024*1024)   #pylint: disable=R1732
+        self.handle.write("".join(f"{strip_ansi_codes(line)}\n" for line in lines))
+        if self.rotate_bytes and self.handle.tell() >= self.rotate_bytes: self.rotate()
+
+    def close_handle(self):
+        if self.handle is not None: self.handle.close()
+        self.handle, self.handle_path = None, None
+
+    def rotate(self):                                                                               #the full logfile becomes get-art.log.001 (or .002, ...), and the next line starts a fresh one
+        path = self.handle_path
+        self.close_handle()
+        part = 1
+        while os.path.exists(f"{path}.{part:03d}") or os.path.exists(f"{path}.{part:03d}.gz"): part += 1
+        os.rename(path, f"{path}.{part:03d}")
+        if self.gzip_rotated:
+            with open(f"{path}.{part:03d}", "rb") as full, gzip.open(f"{path}.{part:03d}.gz", "wb") as compressed: shutil.copyfileobj(full, compressed)
+            os.remove(f"{path}.{part:03d}")
+
+
+LOG_WRITER   = LogWriter(LOG_FLUSH_SECONDS, LOG_ROTATE_MB * 1024 * 1024, LOG_GZIP_ROTATED)
+TRACE_WRITER = LogWriter(LOG_FLUSH_SECONDS, logfile=lambda: TRACE_FILE)
+
+
+
+
+##### Tracing: one JSONL record per song, query & API call, so we can see where the time actually goes (see trace_summary.py)
+
+def trace_event(kind, **fields):                                                                    #writes one record into our trace, if we're keeping one
+    if not TRACE_RUN: return
+    TRACE_WRITER.write(json.dumps({"kind": kind, "at": round(time.time(), 3), **fields}, default=str))
+
+
+def song_trace():                                                                                   #the trace of the song this thread is working for, or None
+    return getattr(SONG_CONTEXT, "trace", None)
+
+
+def tally_song_trace(trace=None, **amounts):                                                        #adds to a song's running totals, from whichever thread is doing its work
+    trace = trace or song_trace()
+    if trace is None: return
+    with STATS_LOCK:
+        for name, amount in amounts.items(): trace[name] = trace.get(name, 0) + amount
+
+
+def note_song_trace(**fields):                                                                      #records facts about the song this thread is working for
+    trace = song_trace()
+    if trace is not None: trace.update(fields)
+
+
+@contextlib.contextmanager
+def traced_stage(stage, trace=None):                                                                #adds how long the with-block took to one stage of a song's trace
+    trace   = trace or song_trace()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if trace is not None:
+            with STATS_LOCK: trace["stages"][stage] = trace["stages"].get(stage, 0) + time.perf_counter() - started
+
+
+def carry_song_context(function):                                                                   #so that work handed to our worker threads still counts towards the song that asked for it, in our trace & profile
+    trace, song_profile = song_trace(), getattr(SONG_CONTEXT, "profile", None)
+    if trace is None and song_profile is None: return function
+    def run_for_song(*args, **kwargs):
+        previous = song_trace(), getattr(SONG_CONTEXT, "profile", None)
+        SONG_CONTEXT.trace, SONG_CONTEXT.profile = trace, song_profile
+        try:
+            return run_for_song_profile(function, *args, **kwargs)
+        finally:
+            SONG_CONTEXT.trace, SONG_CONTEXT.profile = previous
+    return run_for_song
+
+
+def trace_api_call(url, params, cache, response=None, seconds=0, throttle_seconds=0, retries_429=0):                                #pylint: disable=R0913
+    if not TRACE_RUN: return
+    tally_song_trace(**{"cache_hits" if cache == "hit" else "api_calls": 1}, throttle_seconds=throttle_seconds, retries_429=retries_429)
+    headers = response.headers if response is not None else {}
+    trace   = song_trace()
+    trace_event("api_call", song=trace["song"] if trace else None, url=url, params={key: value for key, value in (params or {}).items() if key != "per_page"}, cache=cache,
+                status=response.status_code if response is not None else None, seconds=round(seconds, 4), throttle_seconds=round(throttle_seconds, 4), retries_429=retries_429,
+                rate_limit={"limit": headers.get("X-Discogs-Ratelimit"), "used": headers.get("X-Discogs-Ratelimit-Used"), "remaining": headers.get("X-Discogs-Ratelimit-Remaining")})
+
+
+def trace_song(outcome):                                                                            #writes a song's record, once it is completely finished
+    trace = outcome["trace"]
+    if trace is None: return
+    trace["seconds"]          = time.perf_counter() - trace.pop("started")
+    trace["stages"]           = {stage: round(seconds, 4) for stage, seconds in trace["stages"].items()}
+    trace_event("song", **{name: round(value, 4) if isinstance(value, float) else value for name, value in trace.items()},
+                artist=outcome["artist"], title=outcome["title"], year=outcome["year"], found=bool(outcome["cover_image_url"]),
+                cover_image_url=outcome["cover_image_url"], downloads=len(outcome["downloads"]))
+
+
+
+
+class SongJournal:
+    """
+    Our checkpoint: one JSON line per finished song -- what we parsed, what we asked Discogs, which releases we took art
+    from, and which images we downloaded -- flushed all the way to disk the moment the song is done.  If a run gets killed
+    partway, the next one replays the songs it finished instead of researching them again.  A line cut short by the crash is ignored.
+    """
+
+    def __init__(self):
+        self.finished  = {}                                                                         #song filename -> its record, from the interrupted run we're resuming
+        self.handle    = None
+        self.cut_short = False                                                                      #whether the journal we loaded ends in a line the crash cut short
+
+    def open(self, path, resume=True):                                                              #returns how many finished songs we're resuming with
+        records = self.load(path) if resume else []
+        if records and records[-1].get("kind") == "run_finished": records = []                      #the last run got all the way through, so there's nothing to resume
+        if not records and os.path.exists(path): delete_file_with_backup(path)
+        self.finished = {record["song"]: record for record in records if record.get("kind") == "song"}
+        self.handle   = open(path, "a", encoding="utf-8")
+        if records and self.cut_short: self.handle.write("\n")                                      #so the line the crash cut short doesn't swallow our first new one
+        return len(self.finished)
+
+    def load(self, path):
+        self.cut_short = False
+        if not os.path.exists(path): return []
+        with open(path, encoding="utf-8", errors="replace") as journal: text = journal.read()
+        self.cut_short = bool(text) and not text.endswith("\n")
+        records = []
+        for line in text.splitlines():
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+        return records
+
+    def resumable(self, filename, retry_failures=False):                                           #the record of this song, if the interrupted run finished it and we don't want it researched again
+        record = self.finished.get(filename)
+        if record is None or (retry_failures and record["outcome"] != "found"): return None
+        return record
+
+    def write(self, kind, **fields):
+        if self.handle is None: return
+        self.handle.write(json.dumps({"kind": kind, "at": round(time.time(), 3), **fields}, default=str) + "\n")
+        self.handle.flush()
+        os.fsync(self.handle.fileno())                                                              #on the disk before we move on to the next song, so no crash can lose it
+
+    def close(self):                                                                                #marks the run as finished, so the next one starts afresh
+        if self.handle is None: return
+        self.write("run_finished")
+        self.handle.close()
+        self.handle = None
+
+
+SONG_JOURNAL = SongJournal()
+
+
+def note_song_journal(**fields):                                                                    #adds to the journal entry of the song this thread is working for
+    journal = getattr(SONG_CONTEXT, "journal", None)
+    if journal is not None:
+        for name, values in fields.items(): journal[name].extend(values)
+
+
+def journal_song(outcome):                                                                          #checkpoints a song, once it is completely finished
+    if outcome["resumed"]: return
+    journal = outcome["journal"]
+    if   outcome["cover_image_url"]:                   result = "found"
+    elif outcome["artist"] and outcome["title"]:       result = "not found"
+    else:                                              result = "unparseable"
+    SONG_JOURNAL.write("song", song=outcome["filename"], artist=outcome["artist"], title=outcome["title"], year=outcome["year"], outcome=result,
+                       cover_image_url=outcome["cover_image_url"], queries=journal["queries"], release_ids=journal["release_ids"], downloads=journal["downloads"])
+
+
+def open_song_journal():
+    if not JOURNAL_SONGS: return
+    resumed = SONG_JOURNAL.open(JOURNAL_FILE, resume=RESUME_INTERRUPTED_RUN)
+    if resumed: primt(f"{Fore.CYAN}{Style.BRIGHT}* Resuming an interrupted run: {resumed} songs were already finished, so we'll replay those from {JOURNAL_FILE}"
+                      f"{' (except the ones that found nothing, which get researched again)' if RESUME_RETRY_FAILURES else ''} instead of researching them.{Style.NORMAL}\n")
+
 def remove_repeating_spaces(text):
     pattern = re.compile(r" {2,}")    # This regular expression matches two or more spaces
     return pattern.sub(' ',  text)    # re.sub replaces all occurrences of the pattern in the text with a single space
@@ -221,8 +653,11 @@ def get_platform_info():
 
 def delete_files_from_prevous_run():
     global DOWNLOAD_SCRIPT, LOGFILE
+    LOG_WRITER  .release()                              #our log writers have to let go of their files before they can be moved out of the way
+    TRACE_WRITER.release()
     if os.path.exists(DOWNLOAD_SCRIPT): delete_file_with_backup(DOWNLOAD_SCRIPT)
     if os.path.exists(LOGFILE        ): delete_file_with_backup(LOGFILE        )
+    if os.path.exists(TRACE_FILE     ): delete_file_with_backup(TRACE_FILE     )
 
 
 
@@ -241,6 +676,7 @@ def file_exists_and_nonzero_size(file_path):
 
 
 
+@profiled("parse_filename")
 def parse_filename(filename):
     filename = re.sub  (r'\[[^\]].*[^\]]*\]'             ,          '', filename)   #remove all bracketed clauses from the filename, they are not what we want
     filename = re.sub  (r'\([^\)]*\boriginal\b.*[^\)]*\)',          '', filename)   #remove any "original" in parenthesis
@@ -296,20 +732,11 @@ def does_companion_exist_OLD_tried_and_true_for_a_year(filename):
 
 
 
-def does_companion_exist(filename):                                 #new 2024/04/19 version of function to include truncated last character situation I've run into
-    base_filename_1 = os.path.splitext(filename)[0]                 #with    last charcter
-    base_filename_2 = os.path.splitext(filename)[:-1]               #without last charcter
-    image_extensions = [".jpg", ".jpeg", ".png", ".webp"]
-    possible_filenames = [ f"{filename_to_use}{fname_range_sfx}{image_extension}"
-                          for filename_to_use in [base_filename_1, base_filename_2]
-                          for fname_range_sfx in ["", "A", "B", "C"] + [f"B{i}" for i in range(1, 999)]
-                          for image_extension in image_extensions]
-    #primt("[PF] possible_filenames: " + possible_filenames)
-    for possible_filename in possible_filenames:
-        #primt("[CA] Checking " + possible_filename)
-        if file_exists_and_nonzero_size(possible_filename):
-            return True
-    return False
+def does_companion_exist(filename, index=None):                     #new 2024/04/19 version of function to include truncated last character situation I've run into
+    #now answered from one scan of the folder (see companion_index.py) instead of stat'ing ~8,000 possible companion filenames per song;
+    #pass in an index to reuse it across songs, otherwise this scans the song's folder just for this one question
+    if index is None: index = companion_index.CompanionIndex(os.path.dirname(filename) or ".")
+    return index.has_companion(filename)
 
 
 
@@ -320,6 +747,7 @@ def does_companion_exist(filename):                                 #new 2024/04
 def initialize_download_script():
     global DOWNLOAD_SCRIPT
     global file
+    if not WRITE_DOWNLOAD_SCRIPT: return
     with open(DOWNLOAD_SCRIPT, "a", encoding='utf-8') as file:
         file.write('@Echo OFF\n')
         file.write('\n\n:Start\n')
@@ -344,45 +772,134 @@ def initialize_download_script():
 
 
 def process_all_music_files():
-    global MAXIMUM_RESEARCH_ATTEMPTS, THROTTLE_TIME_NO_RELEASE_FOUND, THROTTLE_TIME_BETWEEN_RESEARCH, THROTTLE_TIME_AFTER_CENSURE
-
-    for filename in os.listdir("."):
+    filenames = []
+    index     = companion_index.CompanionIndex(".")                                    #one scan of the folder tells us every song's companion images
+    for filename in index.audio_files():
         if not (filename.endswith(".mp3") or filename.endswith(".flac")):
             continue
 
-        if does_companion_exist(filename):                                              #skip if song already has a downloaded image
+        if does_companion_exist(filename, index):                                       #skip if song already has a downloaded image
             primt(f"** Companion image file for {filename} already exists and is non-zero in size. Skipping processing.")
             continue
 
-        primt(f"*** Processing {filename}...")                                          #parse the filename
-        artist, title, year = parse_filename(filename)
-        primt(f"   - artist={artist},title={title},year={year}...")
-        if not artist or not title:
-            primt(f"Failed to extract artist and title and year from {filename}\n")
-            continue
-
+        filenames.append(filename)
+
+    if PLAN_LIBRARY_QUERIES and SEARCH_BACKEND == "api": plan_library_queries([filename for filename in filenames if not SONG_JOURNAL.resumable(filename, RESUME_RETRY_FAILURES)])  #after this, every song's research is served from our cache
+
+    if PIPELINE_SONGS_IN_FLIGHT <= 1:                                                   #the old-fashioned way: one song at a time, start to finish
+        for filename in filenames:
+            finish_song(start_song(filename, defer_downloads=False))
+        return
+
+    #pipelined: several songs are researched at once, so one song's fuzzy scoring overlaps the next song's network waits,
+    #but songs are always *finished* in their original order, which keeps get-art.bat deterministic
+    with concurrent.futures.ThreadPoolExecutor(max_workers=PIPELINE_SONGS_IN_FLIGHT, thread_name_prefix="song") as song_executor:
+        in_flight = collections.deque()
+        for filename in filenames:
+            in_flight.append(song_executor.submit(start_song, filename))
+            if len(in_flight) >= PIPELINE_SONGS_IN_FLIGHT: finish_song(in_flight.popleft().result())
+        while in_flight: finish_song(in_flight.popleft().result())
+
+
+def start_song(filename, defer_downloads=True):                                        #researches a song, unless an interrupted run already finished it
+    record = SONG_JOURNAL.resumable(filename, RESUME_RETRY_FAILURES)
+    if record is None: return research_song(filename, defer_downloads)
+    primt(f"*** Resuming {filename}: an interrupted run already finished it, so replaying its downloads from our journal...")
+    return {"filename": filename, "artist": record["artist"], "title": record["title"], "year": record["year"], "cover_image_url": record["cover_image_url"],
+            "downloads": [tuple(download) for download in record["downloads"]], "trace": None, "journal": None, "resumed": True}
+
+
+def research_song(filename, defer_downloads=True):                                     #returns an "outcome" dict that finish_song() turns into output
+    global MAXIMUM_RESEARCH_ATTEMPTS, THROTTLE_TIME_BETWEEN_RESEARCH, THROTTLE_TIME_AFTER_CENSURE
+    outcome = {"filename": filename, "artist": None, "title": None, "year": None, "cover_image_url": None, "downloads": [],
+               "trace": {"song": filename, "started": time.perf_counter(), "stages": {}} if TRACE_RUN else None,
+               "journal": {"queries": [], "release_ids": [], "downloads": []}, "resumed": False}
+
+    primt(f"*** Processing {filename}...")                                              #parse the filename
+    artist, title, year = parse_filename(filename)
+    outcome.update(artist=artist, title=title, year=year)
+    primt(f"   - artist={artist},title={title},year={year}...")
+    if not artist or not title:
+        return outcome
+
+    #our downloads are only *recorded* while we research, so that they can be written out in song order no matter which song finishes first
+    SONG_CONTEXT.pending_downloads = outcome["downloads"] if defer_downloads else None
+    SONG_CONTEXT.trace             = outcome["trace"]
+    SONG_CONTEXT.journal           = outcome["journal"]
+    SONG_CONTEXT.profile           = SongProfile(filename) if PROFILE_SONG and PROFILE_SONG.lower() in filename.lower() else None
+    try:
         #do our research, but keep in mind the API might fail (the code is actually unlikely to ever throw an exception here, though):
         found = False
-        cover_image_url = None
         for i in range(MAXIMUM_RESEARCH_ATTEMPTS):
             if not found:
                 try:
                     found = True
-                    cover_image_url = search_discogs(artist, title, year, filename)
-                    time.sleep(THROTTLE_TIME_BETWEEN_RESEARCH)
+                    outcome["cover_image_url"] = run_for_song_profile(search_discogs, artist, title, year, filename)
+                    throttle_sleep(THROTTLE_TIME_BETWEEN_RESEARCH)
                 except requests.exceptions.HTTPError as exception:
                     found = False
                     primt(f"[QQ](Retry #{i}) An error occurred while searching Discogs: {exception}")
-                    time.sleep(THROTTLE_TIME_AFTER_CENSURE)
+                    tally_song_trace(research_retries=1)
+                    throttle_sleep(THROTTLE_TIME_AFTER_CENSURE)
+        if outcome["trace"]: note_song_trace(research_seconds=time.perf_counter() - outcome["trace"]["started"])
+    finally:
+        if SONG_CONTEXT.profile: SONG_CONTEXT.profile.finish()
+        SONG_CONTEXT.pending_downloads = None
+        SONG_CONTEXT.trace             = None
+        SONG_CONTEXT.journal           = None
+        SONG_CONTEXT.profile           = None
+    return outcome
+
+
+def finish_song(outcome):                                                               #always called from the main thread, in song order
+    global THROTTLE_TIME_NO_RELEASE_FOUND, SONGS_RESUMED
+    if outcome["resumed"]: SONGS_RESUMED += 1
+    filename, artist, title, year, trace = outcome["filename"], outcome["artist"], outcome["title"], outcome["year"], outcome["trace"]
+    try:
+        if not artist or not title:
+            primt(f"Failed to extract artist and title and year from {filename}\n")
+            return
+
+        with traced_stage("downloads", trace):
+            for url, download_filename in outcome["downloads"]:
+                download_image(url, download_filename)
 
-        if not cover_image_url:
+        if not outcome["cover_image_url"]:
             primt(f"{Fore.RED}{Style.BRIGHT}Failed to find release on Discogs for artist={artist},title={title}\n{Fore.WHITE}{Style.NORMAL}")
-            time.sleep(THROTTLE_TIME_NO_RELEASE_FOUND)
-            continue
+            if not outcome["resumed"]: throttle_sleep(THROTTLE_TIME_NO_RELEASE_FOUND, trace)       #the user already got their chance to notice this one, the first time
+            return
 
         cover_image_filename = f"{os.path.splitext(filename)[0]}.jpg"
         primt(f"{Fore.GREEN}* Located cover art for artist={artist},title={title},year={year} as {cover_image_filename}{Fore.WHITE}")
+    finally:
+        trace_song(outcome)
+        journal_song(outcome)
+
 
+def plan_library_queries(filenames):                                                    #works out every distinct query the whole folder needs, and fetches each one exactly once
+    started         = time.perf_counter()
+    planned_queries = collections.OrderedDict()                                         #query tuple -> [query, how many songs want it]
+    per_file_queries = 0
+    for filename in filenames:
+        artist, title, year = parse_filename(filename)
+        if not artist or not title: continue
+        for query in build_research_queries(artist, title, year)[0]:
+            per_file_queries += 1
+            planned = planned_queries.setdefault(tuple(query.items()), [query, 0])
+            planned[1] += 1
+
+    primt(f"{Fore.CYAN}{Style.BRIGHT}* Query plan: {len(filenames)} songs need {per_file_queries} queries, but only {len(planned_queries)} of them are distinct. Fetching those now...{Style.NORMAL}")
+    queries   = [query for query, _ in planned_queries.values()]
+    max_pages = 1 if EARLY_STOP_PAGINATION else None                                    #when stopping early, how deep to go depends on the song, so we can only share the first page
+    list(RESEARCH_EXECUTOR.map(lambda query: get_api_results(dict(query), [], None, max_pages=max_pages), queries))  #we only want them in our cache, so the results themselves are thrown away
+
+    api_calls_saved = 0                                                                 #the per-file approach would have fetched every page of a query once per song that wanted it
+    for query, song_count in planned_queries.values():
+        page_1 = api_cache_get(f"{search_cache_key(query)}#page=1")
+        if page_1 is not None: api_calls_saved += min(pages_to_fetch(page_1[1]), max_pages or PAGE_LIMIT) * (song_count - 1)
+    primt(f"{Fore.CYAN}{Style.BRIGHT}* Query plan done: sharing queries across songs saves {Fore.GREEN}{api_calls_saved}{Fore.CYAN} API calls compared to researching every song separately.{Style.NORMAL}\n")
+    trace_event("plan", songs=len(filenames), queries=per_file_queries, distinct_queries=len(planned_queries), api_calls_saved=api_calls_saved, seconds=round(time.perf_counter() - started, 4))
+    return api_calls_saved
 
 
 
@@ -420,18 +937,7 @@ def maybe_get_year_from_title(year, title):
     return year, title
 
 
-def search_discogs(artist, title, year, filename, pass_num=1):
-    global MAX_TIED_RESULTS_TO_CHECK
-    results         = []
-    response        = None
-    cover_image_url = None
-
-    ## preserve arguments for safer recursion
-    original_artist   = artist
-    original_title    = title
-    original_year     = year
-    original_filename = filename
-
+def build_research_queries(artist, title, year):                                                   #returns (unique_queries, title, year, artist_before_ampersand, artist_has_ands_or_amps) -- the title & year come back cleaned up
     ## Titles require a bit of special logic, mostly related to the year accidentally creeping into our title
     year, title = maybe_get_year_from_title(year,title)
     title       = sanitize_title(title)                                                             # removes "(v1)" "(v2)"
@@ -467,18 +973,49 @@ def search_discogs(artist, title, year, filename, pass_num=1):
                                                                                                     # Research 9+:generated at runtime below to change "&" to " and " and vice versa
 
     processed_queries = set()                                 #go through each of our queries and make sure "&" and "and" are properly cross-checked
+    unique_queries    = []                                    #go through each of our queries and make sure "&" and "and" are properly cross-checked
     for query in research_queries:                            #go through each of our queries and make sure "&" and "and" are properly cross-checked
         for annnd in ["&", " and "]:                          #the spaces before/after and are very important if you don't want to match Ferdinand or Andy! Though it prevents the subtitution from working if "And" the first or last word, which is possibly a slight cost, but not a cost great enough to warrant fixing this with more complicated code. I think if a band starts with the word And they far less likely to use an ampersand there
             if annnd in query.get("artist", "") or annnd in query.get("title", "") or annnd in query.get("q", ""):
                 query_with_and = {k: remove_repeating_spaces(v.replace(annnd, " and ")) if isinstance(v, str) else v for k, v in query.items()}
                 query_with_amp = {k: remove_repeating_spaces(v.replace(annnd, " & "  )) if isinstance(v, str) else v for k, v in query.items()}
-                response  =  get_api_results_unique(query_with_and, processed_queries, results, response)
-                response  =  get_api_results_unique(query_with_amp, processed_queries, results, response)
+                add_query_if_unique(query_with_and, processed_queries, unique_queries)
+                add_query_if_unique(query_with_amp, processed_queries, unique_queries)
             else:
-                response  =  get_api_results_unique(query,          processed_queries, results, response)
+                add_query_if_unique(query,          processed_queries, unique_queries)
+
+    return unique_queries, title, year, artist_before_ampersand, artist_has_ands_or_amps
+
+
+def search_discogs(artist, title, year, filename):
+    unique_queries, title, year, artist_before_ampersand, artist_has_ands_or_amps = build_research_queries(artist, title, year)
+    primt(f"\t{Fore.MAGENTA}- Scoring results as they arrive: title={title}, artist={artist}, year={year}, artist_before_ampersand={artist_before_ampersand}, filename={filename}, artist_has_ands_or_amps={artist_has_ands_or_amps}")
+    song       = SongContext(filename, artist, title, year, artist_before_ampersand, artist_has_ands_or_amps)
+    candidates = TopCandidates(MAX_TIED_RESULTS_TO_CHECK, lambda page_results: score_results(page_results, song))     # score results by many fuzzy sort crtieria (both passes' formulas at once), keeping only the best
+    note_song_journal(queries=[dict(query) for query in unique_queries])
+    with traced_stage("fetch_and_score"): get_api_results_concurrently(unique_queries, candidates)   #all our research happens at once; the rate limiter keeps us honest
+    note_song_trace(queries=len(unique_queries), basket_size=candidates.distinct_results, score=candidates.best("score"), score_2=candidates.best("score_2"))
+
+    with traced_stage("rank"): ranked_results = rank_results(candidates, pass_num=1)
+    if not ranked_results: return None
+
+    with traced_stage("tied_results"): found_images, cover_image_url = download_images_for_tied_results(ranked_results, filename)
+    note_song_trace(found_on_pass=1 if found_images else None)
+    if found_images: return cover_image_url    #would make more sense actually: consider making this a list: return cover_image_urls if cover_image_urls else None
+
+    #if we ended up with no results (no cover_image_url) at this point, make a 2nd pass of consideration to use our 2nd-pass formula
+    #every result already has its 2nd-pass score, so this is just a re-ranking of what we already have: no new lookups, and no waiting
+    primt(f"{Fore.YELLOW}{Style.BRIGHT}* Attempting 2nd pass at results...{Style.NORMAL}")
+    with traced_stage("rank"): ranked_results = rank_results(candidates, pass_num=2)
+    with traced_stage("tied_results"): found_images, cover_image_url = download_images_for_tied_results(ranked_results, filename)
+    note_song_trace(found_on_pass=2 if found_images else None)
+    if found_images: return cover_image_url
+    return None
 
-    results = sort_results_with_fuzzy_logic(results,title,artist,year,artist_before_ampersand,filename,artist_has_ands_or_amps,pass_num=pass_num)          # sort results by many fuzzy sort crtieria
-    if not results: return None
+
+def download_images_for_tied_results(results, filename):                     #returns (found_images, cover_image_url)
+    global MAX_TIED_RESULTS_TO_CHECK
+    cover_image_url = None
 
     # the old method was to just look at the topmost result:
     #cover_image_url = results[0].get("cover_image")                        # get cover image
@@ -487,12 +1024,14 @@ def search_discogs(artist, title, year, filename, pass_num=1):
     highest_score = results[0]["score"]  # Assuming the "score" key stores the fuzzy match score
 
     # but the new method is to process the first N results with the same tied-highest score, because ties happen, and sometimes the artwork is only in one instance
+    # the release data for all of those tied B-sides is fetched at the same time, up front, so a tie costs one round of lookups instead of N
+    prefetch_release_data(tied_top_results(results))
     found_images = False
     for i, result in enumerate(results[:MAX_TIED_RESULTS_TO_CHECK]):
         primt(f"  {Fore.BLUE}[TIEDRESULT] results[{i}] is {str(results[i])}")
         if result["score"] != highest_score: break
 
-        cover_image_url = result.get("cover_image")
+        cover_image_url = result.get("cover_image") or get_cover_image_from_release_data(result)
 
         if cover_image_url:
             primt(f"  {Fore.CYAN}[TIEDRESULT] cover_image_url   found: {cover_image_url}")
@@ -505,8 +1044,9 @@ def search_discogs(artist, title, year, filename, pass_num=1):
         else:
             primt(f"  {Fore.RED}{Style.BRIGHT}[TIEDRESULT] cover_image_url not found!{Style.NORMAL}")
 
-        cover_image_url_b = search_and_download_bside_images([result], filename, response)
+        cover_image_url_b = search_and_download_bside_images([result], filename)
         if cover_image_url_b: found_images = True
+        if cover_image_url or cover_image_url_b: note_song_journal(release_ids=[result.get("id")])
         primt(f"  {Fore.CYAN}[TIEDRESULT] cover_image_url_b found: {cover_image_url_b}")
 
         tmp_filename = filename
@@ -516,12 +1056,9 @@ def search_discogs(artist, title, year, filename, pass_num=1):
             found_images = True
             download_image(cover_image_url, tmp_filename)
 
-    if found_images: return cover_image_url    #would make more sense actually: consider making this a list: return cover_image_urls if cover_image_urls else None
+    return found_images, cover_image_url
+
 
-    #if we ended up with no results (no cover_image_url) at this point, make a 2nd pass of consideration to use our 2nd-pass formula
-    if pass_num == 2: return None
-    primt(f"{Fore.YELLOW}{Style.BRIGHT}* Attempting 2nd pass at results...{Style.NORMAL}")
-    return search_discogs(original_artist, original_title, original_year, original_filename, pass_num=2)
 
 
 
@@ -529,80 +1066,153 @@ def search_discogs(artist, title, year, filename, pass_num=1):
 
 
 
+def tied_top_results(results):                                                          #the results at the top that share its score, which are the ones we take images from
+    highest_score = results[0]["score"] if results else None
+    return list(itertools.takewhile(lambda result: result["score"] == highest_score, results[:MAX_TIED_RESULTS_TO_CHECK]))
 
 
-def get_api_results_unique(query, processed_queries, results, response):
+def add_query_if_unique(query, processed_queries, unique_queries):
     query_tuple = tuple(query.items())
     if query_tuple not in processed_queries:
-        response = get_api_results(query, results, response)
+        unique_queries.append(query)
         processed_queries.add(query_tuple)
-    return response
 
 
-def get_api_results(params, results, response, resource_url=None):
-    global API_CACHE, API_CALLS_MADE, API_CALLS_SAVED_BY_CACHING, CACHE_HITS, PAGINATION_SUPPORT, THROTTLE_API_CALLS_LEFT, RESULTS_FOUND, PAGE_LIMIT
+def get_api_results_concurrently(queries, candidates):                                             #runs all our queries at once, handing every page to candidates as it arrives
+    responses = list(RESEARCH_EXECUTOR.map(carry_song_context(lambda query_index, query: get_api_results(query, [], None, page_scorer=lambda page, page_results: candidates.offer(page_results, query_index, page, query))),
+                                           range(len(queries)), queries))
+    responses = [response for response in responses if response is not None]
+    return responses[-1] if responses else None
 
-    primt(f"{Fore.RED}{Style.BRIGHT}    ...Making API call: params={str(params)}{Style.NORMAL}{Fore.WHITE}")
 
-    url_to_call = ""
-    paging_applicable = True
-    cache_key = str(params) + str(resource_url)  # Generate a cache key
-    api_calls_made_for_this_call = 0
-    if cache_key not in API_CACHE:
-        paging_applicable, url_to_call, params = handle_paging(paging_applicable,resource_url,url_to_call,params)
-
-        page = 1
-        has_more_pages = True  # not *really* necessarily true at this point
-        while has_more_pages and page <= PAGE_LIMIT:
-            if paging_applicable: params["page"] = page
-            try:
-                response = requests.get(url_to_call, headers=HEADERS, params=params, timeout=REQUEST_TIMEOUT)
-                response.raise_for_status()
-                API_CALLS_MADE += 1
-                api_calls_made_for_this_call += 1
-                throttle_api_request_rate_if_necessary(response)
-                primt(f"       {Fore.GREEN}{Style.NORMAL}...Response is: params={str(response)}")
-            except requests.exceptions.HTTPError as exception:
-                primt(f"\n\n{Fore.RED}{Style.BRIGHT}** HTTP error occurred: {exception}")
-                time.sleep(THROTTLE_TIME_AFTER_CENSURE*2)
-                continue
-            except Exception as e:
-                primt(f"\n\n{Fore.RED}{Style.BRIGHT}** General exeption error occurred: {exception}")
-                time.sleep(THROTTLE_TIME_AFTER_CENSURE*2)
-                continue
+def basket_key(result):                                                                             #what makes two results the same release
+    return result.get("id") or result.get("resource_url") or id(result)
 
 
-            if response is None or "results" not in response.json(): return response
-            json_data = response.json()
-            current_results = json_data["results"]
-            RESULTS_FOUND += len(current_results)
-            results.extend(current_results)
-
-            pagination   = json_data["pagination"]                                                     # ...Pagination logic because
-            total_pages  = pagination["pages"]                                                         # Discogs API will only return
-            current_page = pagination["page"]                                                          # a max of 100 results at a time
-            has_more_pages = current_page < total_pages                                                # ...pagination logic
-            page += 1                                                                                  # ...pagination logic
-            if (page > 1 and not PAGINATION_SUPPORT) or (page >= PAGE_LIMIT): has_more_pages = False   # ...pagination logic
-            throttle_api_request_rate_if_necessary(response,results,current_results)
+@profiled("get_api_results")
+def get_api_results(params, results, response, resource_url=None, page_scorer=None, max_pages=None):
+    global API_CACHE, API_CALLS_MADE, API_CALLS_SAVED_BY_CACHING, CACHE_HITS, PAGINATION_SUPPORT, THROTTLE_API_CALLS_LEFT, RESULTS_FOUND, PAGE_LIMIT
 
-        primt (f"{Fore.MAGENTA}* Storing call to API_CACHE[key={cache_key}] = (current_results, response.headers, api_calls_made_for_this_call={api_calls_made_for_this_call})")
-        API_CACHE[cache_key] = (current_results, response.headers, api_calls_made_for_this_call)       # Cache the results & store how many API calls this cache will save for future statistical bragging rights
+    primt(f"{Fore.RED}{Style.BRIGHT}    ...Making API call: params={str(params)}{Style.NORMAL}{Fore.WHITE}")
 
+    started = time.perf_counter()
+    url_to_call = ""
+    paging_applicable = True
+    cache_key = search_cache_key(params, resource_url)
+    paging_applicable, url_to_call, params = handle_paging(paging_applicable,resource_url,url_to_call,params)
+
+    #page 1 tells us how many pages there are, after which the rest of the pages can all be fetched at the same time
+    page_1 = fetch_api_page(url_to_call, params, 1, cache_key, paging_applicable)
+    current_results, pagination, response, _ = page_1
+    if current_results is None: return response
+    last_page = 1
+    if paging_applicable: last_page = pages_to_fetch(pagination)                                                          # ...pagination logic because Discogs API will only return a max of 100 results at a time
+    if max_pages: last_page = min(last_page, max_pages)
+
+    tally = {"made": 0, "saved": 0, "skipped": 0, "response": response}
+    def take(page, fetched):                                                                                               #hands on one page's results, in page order, no matter what order they arrived in
+        current_results, _, page_response, from_cache = fetched
+        tally["saved" if from_cache else "made"] += 1
+        if page_response is not None: tally["response"] = page_response
+        if page_scorer is None:
+            results.extend(dict(result) for result in current_results)                                                     #copies, because scoring writes into them and cached pages are shared between songs
+            return None
+        return page_scorer(page, current_results)                                                                          #returns this page's best (score, score_2)
+
+    if EARLY_STOP_PAGINATION and page_scorer is not None:                                                                  #scoring as we go means paging one page at a time
+        tally["skipped"] = fetch_pages_until_no_improvement(url_to_call, params, cache_key, paging_applicable, take(1, page_1), last_page, take)
     else:
-        current_results, _, api_calls_made_for_that_call = API_CACHE[cache_key]                        #don't end up needing/using response_headers
-        results.extend(current_results)
-        CACHE_HITS += 1
-        if api_calls_made_for_that_call: API_CALLS_SAVED_BY_CACHING += api_calls_made_for_that_call
-        else:                            API_CALLS_SAVED_BY_CACHING += 1
-        primt(f"    {Fore.GREEN}{Style.BRIGHT}...Skipped because cached! (cache hit #{Fore.CYAN}{CACHE_HITS}{Fore.GREEN}, saving {Fore.CYAN}"
-            + f"{api_calls_made_for_that_call}{Fore.GREEN} API calls, total saved now={Fore.CYAN}{Style.BRIGHT}{API_CALLS_SAVED_BY_CACHING}"
+        take(1, page_1)
+        other_pages = PAGE_EXECUTOR.map(carry_song_context(lambda page: fetch_api_page(url_to_call, params, page, cache_key, paging_applicable)), range(2, last_page + 1))
+        for page, fetched in enumerate(other_pages, start=2):                                                              #each page is let go of as soon as it has been handed on
+            if fetched[0] is None: break
+            take(page, fetched)
+    api_calls_made_for_this_call, api_calls_saved_for_this_call, response = tally["made"], tally["saved"], tally["response"]
+
+    if api_calls_saved_for_this_call:
+        with STATS_LOCK: CACHE_HITS += 1
+        primt(f"    {Fore.GREEN}{Style.BRIGHT}...{api_calls_saved_for_this_call} page(s) served from cache, {api_calls_made_for_this_call} fetched! (cache hit #{Fore.CYAN}{CACHE_HITS}{Fore.GREEN}, saving {Fore.CYAN}"
+            + f"{api_calls_saved_for_this_call}{Fore.GREEN} API calls, total saved now={Fore.CYAN}{Style.BRIGHT}{API_CALLS_SAVED_BY_CACHING}"
             + f"{Fore.GREEN}{Style.NORMAL})")
-        time.sleep(1)                                                                                  #give us a second to bask in the good feeling the successful cache hit message
 
+    trace = song_trace()
+    trace_event("query", song=trace["song"] if trace else None, url=url_to_call, params={key: value for key, value in params.items() if key != "per_page"},
+                pages_fetched=api_calls_made_for_this_call, pages_from_cache=api_calls_saved_for_this_call, pages_skipped=tally["skipped"], seconds=round(time.perf_counter() - started, 4))
     return response
 
 
+def fetch_pages_until_no_improvement(url_to_call, params, cache_key, paging_applicable, first_page_scores, last_page, take):                  #pylint: disable=R0913
+    #later pages of a big artist search are usually unrelated to the song we want, so stop once they stop helping; returns how many pages we skipped
+    global PAGES_SKIPPED_EARLY
+    best_score, best_score_2 = first_page_scores
+    pages_without_improvement = 0
+    for page in range(2, last_page + 1):
+        if   best_score >= BEST_POSSIBLE_SCORE and best_score_2 >= BEST_POSSIBLE_SCORE_2: reason = "we already have a perfect score"
+        elif pages_without_improvement >= EARLY_STOP_PATIENCE:                           reason = f"{pages_without_improvement} page(s) in a row didn't beat our best score of {best_score}/{best_score_2}"
+        else:                                                                            reason = None
+        if reason:
+            with STATS_LOCK: PAGES_SKIPPED_EARLY += last_page - page + 1
+            primt(f"    {Fore.YELLOW}{Style.BRIGHT}...Stopped paging early: skipped pages {page}-{last_page} because {reason} (total pages skipped: {PAGES_SKIPPED_EARLY}){Style.NORMAL}")
+            return last_page - page + 1
+        fetched = fetch_api_page(url_to_call, params, page, cache_key, paging_applicable)
+        if fetched[0] is None: break
+        page_best_score, page_best_score_2 = take(page, fetched)
+        if page_best_score > best_score or page_best_score_2 > best_score_2: pages_without_improvement  = 0
+        else:                                                                pages_without_improvement += 1
+        best_score, best_score_2 = max(best_score, page_best_score), max(best_score_2, page_best_score_2)
+    return 0
+
+
+def search_cache_key(params, resource_url=None):                                                   #each page gets its own entry under this key, so a deeper PAGE_LIMIT later only fetches the pages we don't already have
+    return str(params) + str(resource_url)
+
+
+def pages_to_fetch(pagination):                                                                    #how deep we go, given what page 1 told us
+    if not PAGINATION_SUPPORT: return 1
+    return max(1, min(pagination["pages"], PAGE_LIMIT - 1))
+
+
+def fetch_api_page(url_to_call, params, page, cache_key, paging_applicable):                       #returns (current_results, pagination, response, from_cache) for one page, from our cache if we can
+    global API_CALLS_MADE, API_CALLS_SAVED_BY_CACHING, RESULTS_FOUND
+    if SEARCH_BACKEND == "dump" and url_to_call == DISCOGS_API_URL:                                #offline: our data dump index stands in for the search API, and is too fast to be worth caching
+        json_data = discogs_dump.search(params, page, DISCOGS_DUMP_INDEX)
+        with STATS_LOCK: RESULTS_FOUND += len(json_data["results"])
+        return json_data["results"], json_data["pagination"], None, False
+
+    page_cache_key = f"{cache_key}#page={page}"
+    cached = api_cache_get(page_cache_key)
+    if cached is not None:
+        current_results, pagination, _ = cached                                                    #don't end up needing/using response_headers
+        with STATS_LOCK: API_CALLS_SAVED_BY_CACHING += 1
+        trace_api_call(url_to_call, {**params, "page": page} if paging_applicable else params, "hit")
+        return current_results, pagination, None, True
+
+    page_params = dict(params)                                                                     #every page gets its own copy, since pages are fetched in parallel
+    if paging_applicable: page_params["page"] = page
+    while True:
+        try:
+            response = discogs_get(url_to_call, params=page_params, headers=HEADERS)
+            with STATS_LOCK: API_CALLS_MADE += 1
+            throttle_api_request_rate_if_necessary(response)
+            primt(f"       {Fore.GREEN}{Style.NORMAL}...Response is: params={str(response)}")
+            break
+        except requests.exceptions.HTTPError as exception:
+            primt(f"\n\n{Fore.RED}{Style.BRIGHT}** HTTP error occurred: {exception}")
+            throttle_sleep(THROTTLE_TIME_AFTER_CENSURE*2)
+        except Exception as exception:                                                             #pylint: disable=W0718
+            primt(f"\n\n{Fore.RED}{Style.BRIGHT}** General exeption error occurred: {exception}")
+            throttle_sleep(THROTTLE_TIME_AFTER_CENSURE*2)
+
+    json_data = response.json() if response is not None else None
+    if json_data is None or "results" not in json_data: return None, None, response, False
+    current_results = json_data["results"]
+    pagination      = json_data.get("pagination", {"pages": page, "page": page})
+    with STATS_LOCK: RESULTS_FOUND += len(current_results)
+    api_cache_put(page_cache_key, (current_results, pagination, dict(response.headers)), API_CACHE_TTL_DAYS_SEARCH)   # Cache each page on its own
+    throttle_api_request_rate_if_necessary(response, current_results=current_results)
+    return current_results, pagination, response, False
+
+
 def handle_paging(paging_applicable,resource_url,url_to_call,params):
     paging_applicable = True
     if resource_url is None:
@@ -619,9 +1229,206 @@ def handle_paging(paging_applicable,resource_url,url_to_call,params):
 
 
 
+def get_api_cache_db():                                                                             #open (or create) our persistent cache the first time we need it
+    global API_CACHE_DB
+    if API_CACHE_DB is None:
+        API_CACHE_DB = sqlite3.connect(API_CACHE_FILE, check_same_thread=False, isolation_level=None)
+        API_CACHE_DB.execute("PRAGMA journal_mode=WAL")
+        API_CACHE_DB.execute("PRAGMA synchronous=NORMAL")                                            #it's a cache: surviving a crash of ours is plenty, it needn't survive a power cut
+        API_CACHE_DB.execute("CREATE TABLE IF NOT EXISTS api_cache (cache_key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)")
+        API_CACHE_DB.execute("CREATE INDEX IF NOT EXISTS api_cache_last_used ON api_cache (last_used)")
+    return API_CACHE_DB
+
+
+@profiled("api_cache_get")
+def api_cache_get(cache_key, allow_stale=False):                                                    #returns the cached value, or None if we don't have it (or it has expired, unless we're fine with that)
+    global API_CACHE
+    with API_CACHE_LOCK:
+        if cache_key in API_CACHE:
+            API_CACHE.move_to_end(cache_key)
+            return API_CACHE[cache_key]
+        now = time.time()
+        try:
+            db  = get_api_cache_db()
+            row = db.execute("SELECT value, expires_at FROM api_cache WHERE cache_key = ?", (cache_key,)).fetchone()
+            if row is None: return None
+            if row[1] < now and not allow_stale: return None                                        #expired entries stay around (until evicted) so they can be revalidated with Discogs
+            API_CACHE_TOUCHED[cache_key] = now
+        except sqlite3.Error as exception:
+            primt(f"{Fore.RED}{Style.BRIGHT}** Persistent cache read failed, carrying on without it: {exception}{Style.NORMAL}")
+            return None
+        value = json.loads(row[0])
+        if isinstance(value, list): value = tuple(value)                                            #json gives our tuples back as lists
+        if row[1] >= now: remember_in_memory(cache_key, value)                                      #only fresh values get promoted to our in-memory cache
+        return value
+
+
+def memory_size(value):                                                                             #how many results a cached value holds: a page of search results is (results, pagination, headers)
+    if isinstance(value, tuple) and value and isinstance(value[0], list): return max(len(value[0]), 1)
+    return 1
+
+
+def remember_in_memory(cache_key, value):                                                           #caller holds API_CACHE_LOCK
+    global API_CACHE_MEMORY_SIZE
+    if cache_key in API_CACHE: API_CACHE_MEMORY_SIZE -= memory_size(API_CACHE[cache_key])
+    API_CACHE[cache_key] = value
+    API_CACHE.move_to_end(cache_key)
+    API_CACHE_MEMORY_SIZE += memory_size(value)
+    while API_CACHE_MEMORY_SIZE > API_CACHE_MEMORY_RESULTS and len(API_CACHE) > 1:
+        API_CACHE_MEMORY_SIZE -= memory_size(API_CACHE.popitem(last=False)[1])
+
+
+@profiled("api_cache_put")
+def api_cache_put(cache_key, value, ttl_days):
+    global API_CACHE, API_CACHE_WRITES
+    with API_CACHE_LOCK:
+        remember_in_memory(cache_key, value)
+        now = time.time()
+        try:
+            db = get_api_cache_db()
+            db.execute("INSERT OR REPLACE INTO api_cache (cache_key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                       (cache_key, json.dumps(value), now + ttl_days * 86400, now))
+            API_CACHE_TOUCHED.pop(cache_key, None)                                                  #just written, so its last_used is already up to date
+            API_CACHE_WRITES += 1
+            if API_CACHE_WRITES >= API_CACHE_UPKEEP_EVERY: api_cache_upkeep(db)
+        except sqlite3.Error as exception:
+            primt(f"{Fore.RED}{Style.BRIGHT}** Persistent cache write failed, carrying on without it: {exception}{Style.NORMAL}")
+
+
+def api_cache_upkeep(db):                                                                           #caller holds API_CACHE_LOCK; writes out our cache hits, then enforces our size cap
+    global API_CACHE_WRITES
+    API_CACHE_WRITES = 0
+    db.execute("BEGIN")
+    try:
+        db.executemany("UPDATE api_cache SET last_used = ? WHERE cache_key = ?", [(last_used, cache_key) for cache_key, last_used in API_CACHE_TOUCHED.items()])
+        API_CACHE_TOUCHED.clear()
+        overflow = db.execute("SELECT COUNT(*) FROM api_cache").fetchone()[0] - API_CACHE_MAX_ENTRIES
+        if overflow > 0:                                                                            #size cap: evict the least-recently-used entries
+            db.execute("DELETE FROM api_cache WHERE cache_key IN (SELECT cache_key FROM api_cache ORDER BY last_used LIMIT ?)", (overflow,))
+        db.execute("COMMIT")
+    except sqlite3.Error:
+        db.execute("ROLLBACK")
+        raise
+
+
+def close_api_cache():
+    global API_CACHE_DB
+    with API_CACHE_LOCK:
+        if API_CACHE_DB is not None:
+            try:
+                api_cache_upkeep(API_CACHE_DB)
+            except sqlite3.Error as exception:
+                primt(f"{Fore.RED}{Style.BRIGHT}** Persistent cache upkeep failed, carrying on without it: {exception}{Style.NORMAL}")
+            API_CACHE_DB.close()
+            API_CACHE_DB = None
+
+
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every request we send to a host.  Tokens drip in at the advertised per-minute rate (minus our
+    safety margin) so calls get spaced out evenly, and every response re-syncs the bucket from Discogs' own
+    X-Discogs-Ratelimit / -Used / -Remaining headers.  A 429 with Retry-After pauses the whole bucket, not just one caller.
+    """
+
+    def __init__(self, per_minute, safety_margin=0, burst=1):
+        self.safety_margin = safety_margin
+        self.burst         = burst
+        self.per_second    = max(per_minute - safety_margin, 1) / 60
+        self.tokens        = burst
+        self.last_refill   = time.monotonic()
+        self.paused_until  = 0
+        self.seconds_slept = 0                                                                      #total time callers spent waiting on this bucket, for our final report
+        self.lock          = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens      = min(self.burst, self.tokens + (now - self.last_refill) * self.per_second)
+        self.last_refill = now
+
+    def acquire(self):                                                                              #blocks until we're allowed to send one request; returns how long we slept
+        slept = 0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = max(self.paused_until - now, 0)
+                if wait == 0 and self.tokens >= 1:
+                    self.tokens -= 1
+                    self.seconds_slept += slept
+                    return slept
+                wait = max(wait, (1 - self.tokens) / self.per_second)
+            time.sleep(wait)
+            slept += wait
+
+    def update_from_headers(self, headers):                                                         #sync ourselves with what Discogs says about our last-minute usage
+        limit     = headers.get('X-Discogs-Ratelimit'          )
+        used      = headers.get('X-Discogs-Ratelimit-Used'     )
+        remaining = headers.get('X-Discogs-Ratelimit-Remaining')
+        if limit is None: return
+        limit = int(limit)
+        if remaining is None and used is not None: remaining = limit - int(used)
+        with self.lock:
+            self.per_second = max(limit - self.safety_margin, 1) / 60
+            if remaining is not None:                                                               #only if Discogs thinks we're closer to the edge than we do, believe Discogs; otherwise the normal drip takes care of it
+                self._refill(time.monotonic())
+                if int(remaining) < self.tokens: self.tokens = int(remaining)
+
+    def pause(self, seconds):                                                                       #everybody waits, e.g. after a 429
+        with self.lock:
+            self.tokens       = min(self.tokens, 0)
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+DISCOGS_RATE_LIMITER = RateLimiter(RATE_LIMIT_PER_MINUTE, safety_margin=RATE_LIMIT_SAFETY_MARGIN, burst=RATE_LIMIT_BURST)
+
+
+def create_http_session():                                                                          #one pooled, keep-alive session for everything, so we aren't paying for a new TLS handshake on every call
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://" , adapter)
+    session.headers.update({"Accept-Encoding": "gzip, deflate"})
+    if DISCOGS_TRAFFIC == "record": return discogs_replay.RecordingSession(session, discogs_replay.FixtureStore(DISCOGS_FIXTURES))
+    if DISCOGS_TRAFFIC == "replay":
+        if REPLAY_SERVER_URL: return discogs_replay.RedirectingSession(session, REPLAY_SERVER_URL)
+        return discogs_replay.ReplaySession(discogs_replay.StandIn(discogs_replay.FixtureStore(DISCOGS_FIXTURES), latency=REPLAY_LATENCY_SECONDS,
+                                                                   rate_limit=REPLAY_RATE_LIMIT, chance_of_429=REPLAY_CHANCE_OF_429))
+    return session
+
+
+HTTP_SESSION = create_http_session()
+
+
+def get_retry_after_seconds(response):
+    retry_after = response.headers.get('Retry-After')
+    try:
+        return max(float(retry_after), 1)
+    except (TypeError, ValueError):                                                                 #missing, or an HTTP-date which Discogs doesn't send, so we don't bother parsing it
+        return THROTTLE_TIME_AFTER_CENSURE
+
+
+def discogs_get(url, params=None, headers=None, rate_limiter=None):                                #every request we make goes through here, so it all shares one rate budget
+    rate_limiter = rate_limiter or DISCOGS_RATE_LIMITER
+    started, slept, retries_429 = time.perf_counter(), 0, 0
+    while True:
+        with profile_timer("rate_limiter"): slept += rate_limiter.acquire()
+        with profile_timer("network"     ): response = HTTP_SESSION.get(url, headers=headers, params=params, timeout=REQUEST_TIMEOUT)
+        rate_limiter.update_from_headers(response.headers)
+        if response.status_code != 429:
+            trace_api_call(url, params, "revalidated" if response.status_code == 304 else "miss", response, time.perf_counter() - started, slept, retries_429)
+            response.raise_for_status()
+            return response
+        retries_429 += 1
+        retry_after = get_retry_after_seconds(response)
+        primt(f"{Fore.RED}{Style.BRIGHT}** Discogs says we're making too many requests (429), waiting {retry_after} seconds...{Style.NORMAL}")
+        rate_limiter.pause(retry_after)
+
+
 def throttle_api_request_rate_if_necessary(response,results=["{unpassed}"],current_results=["{unpassed}"]):                             # pylint: disable=W0102
     #response is the only actionable/truly required parameter, others are for cosmetics & will be substituted with dummy parameters if none are passed
-    global THROTTLE_API#_CALLS_LEFT, THROTTLE_MIN_REQ_TO_HAVE_READY
+    #the actual throttling now happens up front in DISCOGS_RATE_LIMITER.acquire(), so this is just reporting
+    global THROTTLE_API_CALLS_LEFT
 
     primt(f"{Fore.BLUE   }          ...Response to API call #{Style.BRIGHT}{API_CALLS_MADE}{Style.NORMAL}:   response={str(response.headers)}")
     if current_results != ["{unpassed}"]: primt(f"{Fore.CYAN   }           ...Results to API call #{Style.BRIGHT}{API_CALLS_MADE}{Style.NORMAL}: {len(current_results)} current_results={str(current_results)}")
@@ -634,11 +1441,9 @@ def throttle_api_request_rate_if_necessary(response,results=["{unpassed}"],curre
                    + f"{Fore.BLUE}{Style.BRIGHT} used in last minute, {Fore.YELLOW}{THROTTLE_API_CALLS_LEFT} "
                    + f"{Fore.BLUE}{Style.BRIGHT}remaining [{ratelimit_perminute}pm] [total made={Fore.CYAN}{Style.BRIGHT}{API_CALLS_MADE}"
                    + f"{Fore.BLUE}{Style.BRIGHT}] [total saved via caching={Style.BRIGHT}{Fore.CYAN}{API_CALLS_SAVED_BY_CACHING}"
-                   + f"{Fore.BLUE}{Style.BRIGHT}] {Fore.WHITE}")
-        if int(THROTTLE_API_CALLS_LEFT) <= THROTTLE_MIN_REQ_TO_HAVE_READY: time.sleep(THROTTLE_TIME_AFTER_CENSURE)
+                   + f"{Fore.BLUE}{Style.BRIGHT}] [total time throttled={Fore.CYAN}{DISCOGS_RATE_LIMITER.seconds_slept:.1f}s{Fore.BLUE}] {Fore.WHITE}")
     else:
         primt(f"{Fore.RED}{Style.BRIGHT} *** ERROR: Not getting response from Discogs stating how many API calls are left.")
-        time.sleep(THROTTLE_TIME_AFTER_CENSURE*2)
 
 
 
@@ -657,55 +1462,207 @@ def throttle_api_request_rate_if_necessary(response,results=["{unpassed}"],curre
 
 
 
-def sort_results_with_fuzzy_logic(results, title, artist, year, artist_before_ampersand, filename, artist_has_ands_or_amps, pass_num=1):                                        #pylint: disable=R0912,R0913
-    #original_results = results
-    primt(f"\t{Fore.MAGENTA}- Called: sort_results_with_fuzzy_logic(results, title={title}, artist={artist}, year={year}, artist_before_ampersand={artist_before_ampersand}, filename={filename}, artist_has_ands_or_amps={artist_has_ands_or_amps}, pass_num={pass_num})")
-    if not results:
-        primt(f"\t{Fore.YELLOW}- Hmm. Calling sort_results_with_fuzzy_logic had a quick return due to null results.")
-        return results
-    #else:
-        #DEBUG: primt(f"\n{Fore.MAGENTA}{len(results)} Current incoming results "  )
-        #DEBUG: display_results(results)
+@profiled("rank_results")
+def rank_results(candidates, pass_num=1):                                                  #returns the best of our already-scored results, sorted by the given pass's score
+    primt(f"\t{Fore.MAGENTA}- Called: rank_results(candidates, pass_num={pass_num}) with {candidates.distinct_results} distinct results scored, keeping the top {candidates.size}")
+    if not candidates.distinct_results:
+        primt(f"\t{Fore.YELLOW}- Hmm. Calling rank_results had a quick return due to null results.")
+        return []
 
-    for result in results:
-        #DEBUG: primt(f"\n\t{Fore.GREEN}dealing with results: {str(result)} "  )
+    ranked_results = candidates.ranked("score" if pass_num == 1 else "score_2")              #sort the results with fuzzy logic
+    display_results(ranked_results)
+
+    return ranked_results
+
+
+class TopCandidates:
+    """
+    The best few results of one song's research, for both passes' formulas at once.  Pages are scored as soon as they
+    arrive and then let go of, so memory stays flat no matter how many pages an artist search returns.  Ties go to whichever
+    result comes first in query / page / position order, which is exactly what a stable sort of every result would give us.
+    The same release found by several queries is only kept once, remembering every query that found it.
+    """
+
+    def __init__(self, size, score_page):
+        self.size             = size
+        self.score_page       = score_page                                                 #scores a list of results in place, and returns it
+        self.heaps            = {"score": [], "score_2": []}                               #min-heaps of (score, -position, key), so the root is always the next one to let go of
+        self.retained         = {}                                                         #key -> [result, how many heaps it is in]
+        self.first_seen       = {}                                                         #key -> position; one number per distinct release is all we hold on to for the rest
+        self.found_by         = {}                                                         #key -> every query that found it, whether or not it is still retained
+        self.lock             = threading.Lock()
 
-        if "artisttitle" not in result: result["artisttitle"] = ""                # Assign an empty string to 'artisttitle' if it does not exist
+    @property
+    def distinct_results(self):
+        return len(self.first_seen)
 
-        #swap the current title into a field called artisttitle that is more accurately named to represents what it is, but don't do it
-        #if it's already been done, since we may be recursing into here a 2nd time and dealing with a previously-massaged data structure
-        if result["title"] != "":
-            result["artisttitle"] = result["title"]                               #"Metallica - One / The Prince" #this field is actually "artist - title" because of the sloppy way Discogs does it, so we store it back into the data structure just to make things less ambiguous internally
-            result["title"]       = ""                                            #leave this in so we know our results are processed ;)
+    @profiled("keep_top_candidates")
+    def offer(self, page_results, query_index, page, query):                              #scores one page and keeps whatever makes the cut; returns the page's best (score, score_2)
+        global DUPLICATE_RESULTS_MERGED
+        page_results = self.score_page(page_results)                                       #candidates never write into the results they came from, which are shared with our cache
+        found_by     = {key: value for key, value in query.items() if key not in ("page", "per_page")}
+        duplicates   = 0
+        with self.lock:
+            for i, result in enumerate(page_results):
+                position = (query_index * 1000 + page) * 10000 + i                         #query, then page, then position on the page
+                key      = basket_key(result)
+                if key in self.first_seen:
+                    duplicates += 1
+                    if found_by not in self.found_by[key]: self.found_by[key].append(found_by)
+                    if position > self.first_seen[key]: continue
+                    self.drop(key)                                                          #pages arrive out of order, so this is where this release really comes first
+                else:
+                    self.found_by[key] = [found_by]
+                result.found_by      = self.found_by[key]
+                self.first_seen[key] = position
+                self.push(key, result, position)
+        if duplicates:
+            with STATS_LOCK: DUPLICATE_RESULTS_MERGED += duplicates
+        return max((result.score for result in page_results), default=-1), max((result.score_2 for result in page_results), default=-1)
 
-        #extract our values for parsed_artist and parsed_title
-        if " - " in result["artisttitle"]:                                        #separate "artist - title" into artist & title if there's a hyphen
-            split_artist_title = result["artisttitle"].split(" - ")
-            parsed_artist =            split_artist_title[0 ] .strip()
-            parsed_title  = ' - '.join(split_artist_title[1:]).strip()
+    def push(self, key, result, position):                                                 #caller holds self.lock
+        self.retained[key] = [result, 0]
+        for name, heap in self.heaps.items():
+            entry = (getattr(result, name), -position, key)
+            if len(heap) < self.size:
+                heapq.heappush(heap, entry)
+                self.retained[key][1] += 1
+            elif entry > heap[0]:
+                self.release(heapq.heapreplace(heap, entry)[2])
+                self.retained[key][1] += 1
+        if not self.retained[key][1]: del self.retained[key]
+
+    def release(self, key):                                                                #caller holds self.lock; key just fell out of one heap
+        self.retained[key][1] -= 1
+        if not self.retained[key][1]: del self.retained[key]
+
+    def drop(self, key):                                                                   #caller holds self.lock; takes key out of both heaps
+        if key not in self.retained: return
+        for heap in self.heaps.values():
+            heap[:] = [entry for entry in heap if entry[2] != key]
+            heapq.heapify(heap)
+        del self.retained[key]
+
+    def best(self, score_name):                                                            #the top score so far, or None if nothing has been scored
+        with self.lock:
+            return max(self.heaps[score_name])[0] if self.heaps[score_name] else None
+
+    def ranked(self, score_name):                                                          #best first
+        with self.lock:
+            return [self.retained[key][0] for _, _, key in sorted(self.heaps[score_name], reverse=True)]
+
+
+class SongContext:
+    """
+    The song we are researching, held once and shared by every candidate scored against it, instead of being copied into
+    each of them.  The artist scores that only depend on the song's own artist live here too, since they are the same for every candidate.
+    """
+    __slots__ = ("filename", "artist", "title", "year", "artist_before_ampersand", "artist_has_ands_or_amps", "artist_score_ba", "artist_score_and", "artist_score_amp")
+
+    def __init__(self, filename, artist, title, year, artist_before_ampersand, artist_has_ands_or_amps):                #pylint: disable=R0913
+        self.filename                = filename
+        self.artist                  = artist
+        self.title                   = title
+        self.year                    = year
+        self.artist_before_ampersand = artist_before_ampersand
+        self.artist_has_ands_or_amps = artist_has_ands_or_amps
+        #GOATGOATGOATGOATGOATUPDATEDOCUMENTATIONABOUTRESEARCHTPESDONE
+        if artist_has_ands_or_amps:
+            self.artist_score_ba  = fuzz.UWRatio        (artist, artist_before_ampersand)                  #2                   #UWRatio combines all the different types of fuzzy comparisons into one weighted average that works better in general
+            self.artist_score_amp = cached_token_set_ratio(artist, artist.replace(" and ", " & "))         #3
+            self.artist_score_and = cached_token_set_ratio(artist, artist.replace(  "&"  , "and"))         #4
         else:
-            parsed_artist = result["artisttitle"].strip()                         #if there is not a hyphen (which shouldn't happen), just do our best
-            parsed_title  = result["artisttitle"].strip()
-
-        if parsed_artist.endswith("*"): parsed_artist = parsed_artist[:-1]        #remove the last character if it's an apostrophe, because Discogs returns them that way sometimes
-        title_before_slash = parsed_title
-        title_after_slash  = parsed_title
-
-        #deal with splitting slashes for b sides such as "Song 1 / song 2 / with / slashes / in / it" - we do it on the last slash but it really shoudln't have more than one
-        is_b_side = False                                                         #DEBUG: primt(f"[RT1] parsed_artist/title is {parsed_artist} and {parsed_title}")
-        before_slash_score, after_slash_score = -1, -1
-        split_title = set()
-        if " / " in parsed_title:
-            split_title = parsed_title.split(" / ")                               #"One", "The Prince"
-            title_before_slash = ' / '.join(split_title[:-1]).strip()
-            title_after_slash  =            split_title[ -1] .strip()
-            if title.lower() in title_after_slash.lower():                        # this match fails when the song title is not exact
-                is_b_side = True
-                before_slash_score, after_slash_score = 0, 100                    # it turns out that when the year is missing, the best thing to do is to set the match to 100 and not ding any match points for the missing year
-
-        #start to calculate our fuzzy matching scores, starting with the most basic ones:
-        before_slash_score = fuzz.token_set_ratio(title, title_before_slash)
-        after_slash_score  = fuzz.token_set_ratio(title, title_after_slash )
+            self.artist_score_ba  = -1
+            self.artist_score_and = -1
+            self.artist_score_amp = -1
+
+
+class Candidate:
+    """
+    One scored search result.  Only its scores and parsed fields are stored here: the song it was scored against is shared,
+    and the Discogs result itself is kept as-is (never copied, never written to) and only read from when something asks for it.
+    Reads like the result dicts it replaces, i.e. candidate["score"], candidate.get("resource_url"), str(candidate)
+    """
+    __slots__ = ("raw", "song", "found_by", "is_b_side", "score", "score_2", "score_year", "score_artist", "score_artist_og", "score_title",
+                 "score_slash_before", "score_slash_after", "parsed_artist", "parsed_title", "title_before_slash", "title_after_slash")
+    SONG_FIELDS = {"filename": "filename", "original_artist": "artist", "original_title": "title", "artist_before_ampersand": "artist_before_ampersand",
+                   "artist_has_ands_or_amps": "artist_has_ands_or_amps", "score_artist_ba": "artist_score_ba", "score_artist_and": "artist_score_and", "score_artist_amp": "artist_score_amp"}
+    DICT_ORDER  = ("filename", "is_b_side", "tmp_year", "score_year", "score", "score_2", "score_artist", "score_artist_og", "score_artist_ba", "score_artist_and",     #the order our result dicts
+                   "score_artist_amp", "score_title", "score_slash_before", "score_slash_after", "original_artist", "parsed_artist", "original_title",               #used to have their keys in,
+                   "parsed_title", "title_before_slash", "title_after_slash", "artist_has_ands_or_amps", "artist_before_ampersand", "found_by")                     #so our logs read the same
+
+    def __init__(self, raw, song, *, is_b_side=False, score=0, score_2=0, score_year=0, score_artist=0, score_artist_og=0, score_title=0,   #pylint: disable=R0913
+                 score_slash_before=-1, score_slash_after=-1, parsed_artist="", parsed_title="", title_before_slash="", title_after_slash=""):
+        self.raw                = raw
+        self.song               = song
+        self.found_by           = []
+        self.is_b_side          = is_b_side
+        self.score              = score
+        self.score_2            = score_2
+        self.score_year         = score_year
+        self.score_artist       = score_artist
+        self.score_artist_og    = score_artist_og
+        self.score_title        = score_title
+        self.score_slash_before = score_slash_before
+        self.score_slash_after  = score_slash_after
+        self.parsed_artist      = parsed_artist
+        self.parsed_title       = parsed_title
+        self.title_before_slash = title_before_slash
+        self.title_after_slash  = title_after_slash
+
+    def __getitem__(self, name):
+        if name in Candidate.SONG_FIELDS: return getattr(self.song, Candidate.SONG_FIELDS[name])
+        if name in Candidate.__slots__ and name not in ("raw", "song"): return getattr(self, name)
+        if name == "title"      : return ""                                                      #our results used to get their title moved into artisttitle once processed
+        if name == "artisttitle": return self.raw.get("title") or ""
+        if name == "tmp_year"   : return self.raw.get("year", "N/A")
+        return self.raw[name]
+
+    def get(self, name, default=None):
+        try:             return self[name]
+        except KeyError: return default
+
+    def as_dict(self):                                                                             #what this would have been as one of our old result dicts
+        result = {**self.raw, "title": "", "artisttitle": self["artisttitle"]}
+        result.update((name, self[name]) for name in Candidate.DICT_ORDER)
+        return result
+
+    def __repr__(self):
+        return str(self.as_dict())
+
+
+@profiled("score_results")
+def score_results(results, song):                                                                  #returns a scored Candidate for each result                         #pylint: disable=R0914
+    #A basket can hold thousands of results, but far fewer *distinct* strings (the same artist shows up over and over),
+    #so rather than fuzzy-matching result by result, we:
+    #       (1) parse every result into its parsed artist / title / before-slash / after-slash
+    #       (2) fuzzy-score each distinct one of those strings exactly once
+    #       (3) combine those scores with our weighting formulas
+    #The scores (and therefore the rankings) are exactly the same as scoring each result on its own.  This isn't vectorized
+    #scoring: each distinct string is still matched one pair at a time.  Skipping the repeats took benchmark_matching.py's
+    #scoring from 0.72s to 0.48s, about 1.5x.
+    title, artist, year = song.title, song.artist, song.year
+
+    #(1) parse every result
+    parsed_fields = [parse_artist_and_title(result.get("title") or "") for result in results]
+
+    #(2) score each distinct string once
+    title_score_of  = token_set_ratios(title , {text for parsed in parsed_fields for text in parsed[1:]})
+    artist_score_of = token_set_ratios(artist, {parsed[0] for parsed in parsed_fields})
+
+    #Get a artist-match for this result's artist vs:
+    #       (1) the artist we are looking for
+    #       (2) the artist we are looking for, but only the part before any ampersand
+    #       (3) the artist we are looking with ampersand substituted for and        \____ possibly the same thing
+    #       (4) the artist we are looking with and substituted for ampersand        /
+    #Only (1) depends on the result; (2)-(4) only depend on the song, so SongContext computes them once per song
+
+    #(3) combine our scores
+    candidates = []
+    for result, (parsed_artist, parsed_title, title_before_slash, title_after_slash) in zip(results, parsed_fields):
+        #start with the most basic scores -- the slash scores tell us if we're looking at a B-side
+        before_slash_score = title_score_of[title_before_slash]
+        after_slash_score  = title_score_of[title_after_slash ]
         is_b_side = after_slash_score > before_slash_score and after_slash_score > 55
 
         #Get a title-match score for our title, versus this result's varoius sub-titles:
@@ -714,28 +1671,11 @@ def sort_results_with_fuzzy_logic(results, title, artist, year, artist_before_am
         #       (3) the  after-slash section of a slashed title
         #Then take the highest match score out of all of those, and use that as our title match score.
         #GOATGOATGOATGOATGOATUPDATEDOCUMENTATIONABOUTRESEARCHTPESDONE
-        title_scores = [fuzz.token_set_ratio(title, t) for t in [parsed_title, title_before_slash, title_after_slash]]              #parsed_title was originally result["title"] which is really result["artisttitle"] which is "artist - title", but now parsed_title attempts to just be the title
-        title_score = max(title_scores)
-
-        #Get a artist-match for this result's artist vs:
-        #       (1) the artist we are looking for
-        #       (2) the artist we are looking for, but only the part before any ampersand
-        #       (3) the artist we are looking with ampersand substituted for and        \____ possibly the same thing
-        #       (4) the artist we are looking with and substituted for ampersand        /
-        #GOATGOATGOATGOATGOATUPDATEDOCUMENTATIONABOUTRESEARCHTPESDONE
-        artist_score_og  = fuzz.token_set_ratio(artist, parsed_artist)                                         #1                   #parsed_artist was result["title"] is really result["artisttitle"] which is "artist - title", parsed_artist attempts to just be the artist
-        if artist_has_ands_or_amps:
-            artist_score_ba  = fuzz.UWRatio        (artist, artist_before_ampersand)                           #2                   #UWRatio combines all the different types of fuzzy comparisons into one weighted average that works better in general
-            artist_score_amp = fuzz.token_set_ratio(artist, artist.replace(" and ", " & "))                    #3
-            artist_score_and = fuzz.token_set_ratio(artist, artist.replace(  "&"  , "and"))                    #4
-            artist_scores    = [artist_score_og, artist_score_ba, artist_score_and, artist_score_amp]
-            artist_score     = max(artist_scores)
-        else:
-            artist_score_ba  = -1
-            artist_score_and = -1
-            artist_score_amp = -1
-            artist_scores    = []
-            artist_score     = artist_score_og
+        title_score = max(title_score_of[parsed_title], before_slash_score, after_slash_score)              #parsed_title was originally result["title"] which is really result["artisttitle"] which is "artist - title", but now parsed_title attempts to just be the title
+
+        artist_score_og = artist_score_of[parsed_artist]                                                   #1                   #parsed_artist was result["title"] is really result["artisttitle"] which is "artist - title", parsed_artist attempts to just be the artist
+        if song.artist_has_ands_or_amps: artist_score = max(artist_score_og, song.artist_score_ba, song.artist_score_and, song.artist_score_amp)
+        else:                            artist_score = artist_score_og
 
         #Year result should not be character-by-character as the way the library would compute by default, because then 1924 would be considered 75% match to 1925
         #We declare that 1924 should be considered a 99% match to 1925.  Our frame of reference being 1 year = 1%, this means we'd have to be 100 yrs off for 0% match.
@@ -756,40 +1696,69 @@ def sort_results_with_fuzzy_logic(results, title, artist, year, artist_before_am
         #give a lower match to the artist score which bumps some songs' scores down too low.                                             #master weighting formula
         total_score_pass_1 = (title_score * 1 ) + (artist_score * 3 ) + (year_score * 2)                                                 #master weighting formula
         total_score_pass_2 = (title_score * 10) + (artist_score * 30)                                                                    #2nd pass formula for if our 1st pass finds nothing.  We found a case where everything was right but the year was 25 yrs later but it was the sole art on Discogs, which made us realize we need a 2nd pass of consideration if the 1st pass fails
-        #DEBUG: primt(f"\t  {Fore.YELLOW}...[pass={pass_num}] title_score: {title_score}, artist_score: {artist_score}, total_score_pass_1: {total_score_pass_1}, total_score_pass_2: {total_score_pass_2}")
-
-        result.update(
-            filename                =          filename        ,
-            is_b_side               =          is_b_side       ,
-            tmp_year                =           tmp_year       ,                              #for debugging purposes
-            score_year              =         year_score       ,
-            score                   =        total_score_pass_1,
-            score_2                 =        total_score_pass_2,
-            score_artist            =       artist_score       ,
-            score_artist_og         =       artist_score_og    ,
-            score_artist_ba         =       artist_score_ba    ,
-            score_artist_and        =       artist_score_and   ,
-            score_artist_amp        =       artist_score_amp   ,
-            score_title             =        title_score       ,
-            score_slash_before      = before_slash_score       ,
-            score_slash_after       =  after_slash_score       ,
-            original_artist         =             artist       ,
-            parsed_artist           =      parsed_artist       ,
-            original_title          =              title       ,
-            parsed_title            =       parsed_title       ,
-            title_before_slash      = title_before_slash       ,
-            title_after_slash       =  title_after_slash       ,
-            artist_has_ands_or_amps =   artist_has_ands_or_amps,
-            artist_before_ampersand =   artist_before_ampersand,
-        )
-
-    if pass_num==1: sortKey = "score"
-    if pass_num==2: sortKey = "score_2"
-    #esults.sort(key=lambda r: r["score"], reverse=True)                                   #sort the results with fuzzy logic
-    results.sort(key=lambda r: r[sortKey], reverse=True)                                   #sort the results with fuzzy logic
-    display_results(results)
-
-    return results
+
+        candidates.append(Candidate(result, song,
+                                    is_b_side          =          is_b_side,
+                                    score_year         =         year_score,
+                                    score              = total_score_pass_1,
+                                    score_2            = total_score_pass_2,
+                                    score_artist       =       artist_score,
+                                    score_artist_og    =    artist_score_og,
+                                    score_title        =        title_score,
+                                    score_slash_before = before_slash_score,
+                                    score_slash_after  =  after_slash_score,
+                                    parsed_artist      =      parsed_artist,
+                                    parsed_title       =       parsed_title,
+                                    title_before_slash = title_before_slash,
+                                    title_after_slash  =  title_after_slash))
+    return candidates
+
+
+def token_set_ratios(query, choices):                                                              #scores our query against each distinct choice, one at a time, returning {choice: score}
+    return {choice: cached_token_set_ratio(query, choice) for choice in choices}
+
+
+@functools.lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def token_set_of(text):                                                                            #normalizes & tokenizes text exactly like fuzz.token_set_ratio does, but only once per distinct string; None if nothing is left of it
+    processed = fuzz_utils.full_process(text, force_ascii=True)
+    if not fuzz_utils.validate_string(processed): return None
+    return frozenset(processed.split())
+
+
+@functools.lru_cache(maxsize=MATCH_CACHE_SIZE)
+def cached_token_set_ratio(text_1, text_2):                                                        #the very same number as fuzz.token_set_ratio(text_1, text_2), from our already-tokenized strings
+    tokens_1 = token_set_of(text_1)
+    tokens_2 = token_set_of(text_2)
+    if tokens_1 is None or tokens_2 is None: return 0
+    sorted_sect   =  " ".join(sorted(tokens_1 & tokens_2))
+    combined_1to2 = (sorted_sect + " " + " ".join(sorted(tokens_1 - tokens_2))).strip()
+    combined_2to1 = (sorted_sect + " " + " ".join(sorted(tokens_2 - tokens_1))).strip()
+    return max(fuzz.ratio(sorted_sect, combined_1to2), fuzz.ratio(sorted_sect, combined_2to1), fuzz.ratio(combined_1to2, combined_2to1))
+
+
+def parse_artist_and_title(artisttitle):                                                           #returns (parsed_artist, parsed_title, title_before_slash, title_after_slash)
+    #a Discogs result's "title" is actually "artist - title" because of the sloppy way Discogs does it, i.e. "Metallica - One / The Prince", which is why we call it artisttitle
+
+    #extract our values for parsed_artist and parsed_title
+    if " - " in artisttitle:                                                  #separate "artist - title" into artist & title if there's a hyphen
+        split_artist_title = artisttitle.split(" - ")
+        parsed_artist =            split_artist_title[0 ] .strip()
+        parsed_title  = ' - '.join(split_artist_title[1:]).strip()
+    else:
+        parsed_artist = artisttitle.strip()                                   #if there is not a hyphen (which shouldn't happen), just do our best
+        parsed_title  = artisttitle.strip()
+
+    if parsed_artist.endswith("*"): parsed_artist = parsed_artist[:-1]        #remove the last character if it's an apostrophe, because Discogs returns them that way sometimes
+    title_before_slash = parsed_title
+    title_after_slash  = parsed_title
+
+    #deal with splitting slashes for b sides such as "Song 1 / song 2 / with / slashes / in / it" - we do it on the last slash but it really shoudln't have more than one
+    if " / " in parsed_title:
+        split_title = parsed_title.split(" / ")                               #"One", "The Prince"
+        title_before_slash = ' / '.join(split_title[:-1]).strip()
+        title_after_slash  =            split_title[ -1] .strip()
+
+    return parsed_artist, parsed_title, title_before_slash, title_after_slash
 
 
 def year_similarity_score(year1, year2):
@@ -812,6 +1781,7 @@ def year_similarity_score(year1, year2):
 
 
 
+@profiled("display_results")
 def display_results(results):
     primt(f"\n\n    {Fore.BLUE}** sorted results[DR] are (raw first, then pretty):{str(results)}\n\n\n\n   {Fore.CYAN}** {len(results)} clean sorted results [DR]:")
     for result in results:
@@ -825,6 +1795,7 @@ def display_results(results):
         primt(  f"\t     Parsed  Title: {result.get('parsed_title'           , 'N/A')}")
         primt(  f"\t              Year: {result.get('year'                   , 'N/A')}")
         primt(  f"\t                id: {result.get('id'                     , 'N/A')}")
+        primt(  f"\t          Found by: {result.get('found_by'               , 'N/A')}")
         primt(  f"\t     Title Befor /: {result.get('title_before_slash'     , 'N/A')}")
         primt(  f"\t     Title After /: {result.get('title_after_slash'      , 'N/A')}")
         #rimt(  f"\t         master_id: {result.get('master_id'              , 'N/A')}")                                                  #master_id not defined in this situation
@@ -853,18 +1824,16 @@ def display_results(results):
 
 
 
-def search_and_download_bside_images(results, filename, response):
+def search_and_download_bside_images(results, filename):
     is_b_side    = results[0].get("is_b_side")
     resource_url = results[0].get("resource_url")
 
     if not is_b_side:    return None
     if not resource_url: return None
 
-    primt(f"\n        {Fore.YELLOW}{Style.NORMAL}*[R1D] search_and_download_bside_images(results, filename={filename}, response){Fore.WHITE}")
+    primt(f"\n        {Fore.YELLOW}{Style.NORMAL}*[R1D] search_and_download_bside_images(results, filename={filename}){Fore.WHITE}")
     primt(  f"        *[R1D] calling fetch_release_data on resource URL of {resource_url}")
-    response = fetch_release_data(resource_url)
-    primt(f"        {Fore.CYAN}{Style.NORMAL}*[R1D] bside response is {str(response)}{Fore.WHITE}")
-    release_data = response.json()
+    release_data = get_release_data_future(resource_url, results[0].get("id")).result()
 
     if release_data is None: return None
 
@@ -894,20 +1863,68 @@ def search_and_download_bside_images(results, filename, response):
 
 
 
+def prefetch_release_data(results):                                                                 #start fetching release data for every B-side result at once, without waiting for any of it
+    for result in results:
+        needs_cover_image = SEARCH_BACKEND == "dump" and not result.get("cover_image")            #the data dump doesn't have image URLs, so those come from the release data
+        if (result.get("is_b_side") or needs_cover_image) and result.get("resource_url"):
+            get_release_data_future(result["resource_url"], result.get("id"))
+
+
+def get_cover_image_from_release_data(result):                                                      #only for search results from our data dump index, which has no image URLs
+    if SEARCH_BACKEND != "dump" or not result.get("resource_url"): return None
+    release_data = get_release_data_future(result["resource_url"], result.get("id")).result() or {}
+    images = release_data.get("images", [])
+    primary_images = [image for image in images if image.get("type") == "primary"] or images
+    return primary_images[0].get("uri") if primary_images else None
+
+
+def get_release_data_future(resource_url, release_id=None):                                        #each release is only ever fetched once per run, no matter how many songs (or both sides of the same 78) ask for it
+    release_key = release_id or resource_url
+    with RELEASE_DATA_LOCK:
+        future = RELEASE_DATA_FUTURES.get(release_key)
+        if future is None or (future.done() and future.exception() is not None):                   #never fetched, or it failed last time and deserves another try
+            future = RELEASE_DATA_EXECUTOR.submit(carry_song_context(fetch_release_data), resource_url)
+            RELEASE_DATA_FUTURES[release_key] = future
+        RELEASE_DATA_FUTURES.move_to_end(release_key)
+        while len(RELEASE_DATA_FUTURES) > RELEASE_DATA_CACHE_SIZE:                                  #forget the least-recently-used ones; the persistent cache still has them
+            RELEASE_DATA_FUTURES.popitem(last=False)
+    return future
+
+
+@profiled("fetch_release_data")
 def fetch_release_data(resource_url):
-    global THROTTLE_API_CALLS_LEFT, API_CALLS_MADE
-    while True:
-        try:
-            response = requests.get(resource_url, headers=HEADERS, timeout=REQUEST_TIMEOUT)
-            response.raise_for_status()
-            API_CALLS_MADE += 1
-            throttle_api_request_rate_if_necessary(response)
-            return response
-        except requests.exceptions.HTTPError as exception:
-            if response.status_code == 429:
-                time.sleep(THROTTLE_TIME_AFTER_CENSURE)
-            else:
-                raise exception
+    global THROTTLE_API_CALLS_LEFT, API_CALLS_MADE, API_CALLS_SAVED_BY_CACHING, API_CALLS_REVALIDATED, CACHE_HITS
+    cache_key = "release:" + resource_url
+    cached = api_cache_get(cache_key)
+    if cached is not None and cached.get("release_data") is not None:
+        with STATS_LOCK:
+            CACHE_HITS                 += 1
+            API_CALLS_SAVED_BY_CACHING += 1
+        trace_api_call(resource_url, None, "hit")
+        primt(f"        {Fore.GREEN}{Style.BRIGHT}*[R1D] release data for {resource_url} was cached! (cache hit #{Fore.CYAN}{CACHE_HITS}{Fore.GREEN}){Style.NORMAL}")
+        return cached["release_data"]
+
+    #if we have an expired copy, ask Discogs whether it has changed -- a 304 is a lot cheaper than the whole release all over again
+    stale = api_cache_get(cache_key, allow_stale=True) or {}
+    headers = dict(HEADERS)
+    if stale.get("release_data") is not None:
+        if stale.get("etag"         ): headers["If-None-Match"    ] = stale["etag"]
+        if stale.get("last_modified"): headers["If-Modified-Since"] = stale["last_modified"]
+
+    response = discogs_get(resource_url, headers=headers)                                          #429s are waited out in there; anything else is raised to our caller
+    with STATS_LOCK: API_CALLS_MADE += 1
+    throttle_api_request_rate_if_necessary(response)
+    primt(f"        {Fore.CYAN}{Style.NORMAL}*[R1D] bside response is {str(response)}{Fore.WHITE}")
+    if response.status_code == 304:
+        with STATS_LOCK: API_CALLS_REVALIDATED += 1
+        release_data = stale["release_data"]
+    else:
+        release_data = response.json()
+    if release_data is not None:
+        api_cache_put(cache_key, {"release_data" : release_data,
+                                  "etag"         : response.headers.get("ETag"         , stale.get("etag"         )),
+                                  "last_modified": response.headers.get("Last-Modified", stale.get("last_modified"))}, API_CACHE_TTL_DAYS_RELEASE)
+    return release_data
 
 
 
@@ -945,6 +1962,15 @@ def modify_filename_with_letter(filename, letter):
 def download_image(url, input_filename):
     global DOWNLOADED_URLS, DOWNLOADED_FILENAMES, IMAGES_FOUND, DOWNLOAD_SCRIPT, API_CALLS_MADE
 
+    # while researching, our journal remembers every download, so a resumed run can replay it
+    note_song_journal(downloads=[[url, input_filename]])
+
+    # while researching in a song worker, just remember the download; finish_song() replays it in song order
+    pending_downloads = getattr(SONG_CONTEXT, "pending_downloads", None)
+    if pending_downloads is not None:
+        pending_downloads.append((url, input_filename))
+        return input_filename
+
     # don't download the cover art if we've already downloaded it
     if url in DOWNLOADED_URLS: return input_filename
 
@@ -971,32 +1997,87 @@ def download_image(url, input_filename):
     #primt(f"DEBUG: output_filename = {output_filename}, cleaned_output_filename = {cleaned_output_filename}")
     #primt(f"DEBUG: cleaned_output_filename with A = {modify_filename_with_letter(cleaned_output_filename, 'A')}")
 
-    # only actually download the file if we are configured to do so (and this is untested anyway!)
-    if DOWNLOAD_INTERNALLY:
-        response = requests.get(url, timeout=REQUEST_TIMEOUT)
-        response.raise_for_status()
-        API_CALLS_MADE += 1
-        throttle_api_request_rate_if_necessary(response)
-        with open(cleaned_output_filename, "wb") as file: file.write(response.content)
+    # track what we're downloading
+    IMAGES_FOUND += 1
+    DOWNLOADED_FILENAMES.add(cleaned_output_filename)
+    DOWNLOADED_URLS     .add(url)
 
-    # add the new cover art download to our download script
-    with open(DOWNLOAD_SCRIPT, "a", encoding='utf-8') as file:
-        # Discogs is strict about their "60 requests a minute" rule. In theory, we wait 1 second in between each download
-        # But in practice, this doesn't quite cut it. Therefore we must bump it up to 1.5 - 2.0 seconds at a minimum.
-        if OUR_SHELL == "TCC": file.write(f'if not exist "{cleaned_output_filename}" delay /m 1500\n')       # on my own computer I use TCC and want 1.5 second delays between downloads. Not 1. Not 2. Sleep seems to only accept integers, but TCC has an internal delay command that accepts milliseconds, to give me what I want
-        else:                  file.write(f'if not exist "{cleaned_output_filename}" sleep 2\n')             # but for other people, they'll just have to suffer with 2.0 second pauses instead of 1.5 second pauses 🤣
+    # download it ourselves, in the background, if we are configured to do so
+    if DOWNLOAD_INTERNALLY: IMAGE_DOWNLOADER.submit(url, cleaned_output_filename)
 
-        # track what we're downloading
-        IMAGES_FOUND += 1
-        DOWNLOADED_FILENAMES.add(cleaned_output_filename)
-        DOWNLOADED_URLS     .add(url)
+    # add the new cover art download to our download script
+    if WRITE_DOWNLOAD_SCRIPT:
+        with open(DOWNLOAD_SCRIPT, "a", encoding='utf-8') as file:
+            # Discogs is strict about their "60 requests a minute" rule. In theory, we wait 1 second in between each download
+            # But in practice, this doesn't quite cut it. Therefore we must bump it up to 1.5 - 2.0 seconds at a minimum.
+            if OUR_SHELL == "TCC": file.write(f'if not exist "{cleaned_output_filename}" delay /m 1500\n')       # on my own computer I use TCC and want 1.5 second delays between downloads. Not 1. Not 2. Sleep seems to only accept integers, but TCC has an internal delay command that accepts milliseconds, to give me what I want
+            else:                  file.write(f'if not exist "{cleaned_output_filename}" sleep 2\n')             # but for other people, they'll just have to suffer with 2.0 second pauses instead of 1.5 second pauses 🤣
 
-        # add the download to our download script
-        file.write(f'if not exist "{cleaned_output_filename}" wget -O "{cleaned_output_filename}" "{url}"\n')
+            # add the download to our download script
+            file.write(f'if not exist "{cleaned_output_filename}" wget -O "{cleaned_output_filename}" "{url}"\n')
 
     return cleaned_output_filename
 
 
+class ImageDownloader:
+    """
+    Downloads our cover art in-process, a few images at a time, at a pace of its own that doesn't eat into our API budget.
+    Each image is written to a temporary file and only renamed into place once it has all arrived, so there are never any
+    half-downloaded or zero-byte images lying around.  Images already on disk are skipped, so an interrupted run can just
+    be run again, and each image gets a few retries, with a growing wait in between, before we give up on it.
+    """
+
+    def __init__(self, threads, rate_limiter, retries=0, backoff_seconds=1):
+        self.threads         = threads
+        self.rate_limiter    = rate_limiter
+        self.retries         = retries
+        self.backoff_seconds = backoff_seconds
+        self.executor        = None                                                                  #started by our first download
+        self.futures         = []
+        self.counts          = collections.Counter()                                                 #downloaded, already there, failed
+        self.lock            = threading.Lock()
+
+    def submit(self, url, filename):
+        with self.lock:
+            if self.executor is None: self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="image")
+            self.futures.append(self.executor.submit(self.download, url, filename))
+
+    def download(self, url, filename):                                                               #returns "downloaded", "already there", or "failed"
+        if file_exists_and_nonzero_size(filename): return self.count("already there", url, filename)
+        temporary_filename = f"{filename}.part"
+        for attempt in range(self.retries + 1):
+            if attempt: throttle_sleep(self.backoff_seconds * 2 ** (attempt - 1))
+            try:
+                response = discogs_get(url, headers={"User-Agent": HEADERS["User-Agent"]}, rate_limiter=self.rate_limiter)  #our token stays with the API; the image host doesn't want it
+                if not response.content: raise requests.exceptions.ContentDecodingError(f"{url} came back empty")
+                with open(temporary_filename, "wb") as image_file: image_file.write(response.content)
+                os.replace(temporary_filename, filename)                                             #all or nothing
+                return self.count("downloaded", url, filename, attempt + 1, len(response.content))
+            except requests.exceptions.HTTPError as exception:
+                primt(f"{Fore.RED}** Image download failed (try #{attempt + 1}): {url}: {exception}{Fore.WHITE}")
+                if exception.response is not None and exception.response.status_code < 500: break    #i.e. 404: no use asking again
+            except (requests.exceptions.RequestException, OSError) as exception:
+                primt(f"{Fore.RED}** Image download failed (try #{attempt + 1}): {url}: {exception}{Fore.WHITE}")
+            finally:
+                if os.path.exists(temporary_filename): os.remove(temporary_filename)
+        return self.count("failed", url, filename, attempt + 1)
+
+    def count(self, outcome, url, filename, attempts=0, size=0):                                    #pylint: disable=R0913
+        with self.lock: self.counts[outcome] += 1
+        trace_event("image_download", url=url, filename=filename, outcome=outcome, attempts=attempts, bytes=size)
+        if outcome == "downloaded": primt(f"{Fore.GREEN}    ...Downloaded {filename} ({size} bytes){Fore.WHITE}")
+        return outcome
+
+    def finish(self):                                                                               #waits for every download we've been given; returns our counts
+        with self.lock: futures, self.futures = self.futures, []
+        concurrent.futures.wait(futures)
+        return self.counts
+
+
+IMAGE_RATE_LIMITER = RateLimiter(IMAGE_RATE_LIMIT_PER_MINUTE)
+IMAGE_DOWNLOADER   = ImageDownloader(IMAGE_DOWNLOAD_THREADS, IMAGE_RATE_LIMITER, retries=IMAGE_DOWNLOAD_RETRIES, backoff_seconds=IMAGE_RETRY_BACKOFF_SECONDS)
+
+
 
 
 
@@ -1010,6 +2091,7 @@ def download_image(url, input_filename):
 def clean_up_zero_byte_downloads():                                                                                                 #clean up zero-byte downloads, which is something wget can create, especially if request throttling is not enabled
     #There is some attempt to make this output a script that works under bash/unix/WSL, CMD.exe, and TCC.EXE, but I personally use TCC.EXE so it's mostly untested
     global DOWNLOAD_SCRIPT
+    if not WRITE_DOWNLOAD_SCRIPT: return                                                                                            #our own downloads never leave zero-byte files behind
     with open(DOWNLOAD_SCRIPT, "a", encoding='utf-8') as file:
         file.write('\n\n:Do_It_Twice\n')
         file.write('if "%DONE_ONCE%" ne "1" (set DONE_ONCE=1 %+ goto :Retry_Point)\n')
@@ -1036,7 +2118,7 @@ def clean_up_zero_byte_downloads():
 
 
 def final_report(start_time):
-    global API_CALLS_MADE, API_CALLS_SAVED_BY_CACHING, IMAGES_FOUND, RESULTS_FOUND, THROTTLE_API_CALLS_LEFT, CACHE_HITS
+    global API_CALLS_MADE, API_CALLS_SAVED_BY_CACHING, API_CALLS_REVALIDATED, IMAGES_FOUND, RESULTS_FOUND, THROTTLE_API_CALLS_LEFT, PAGES_SKIPPED_EARLY, DUPLICATE_RESULTS_MERGED, CACHE_HITS
     end_time = time.monotonic()
     elapsed_seconds = end_time - start_time
     elapsed_minutes = elapsed_seconds / 60
@@ -1047,10 +2129,28 @@ def final_report(start_time):
     primt(f"{Fore.GREEN}{Style.BRIGHT}\n\n\n\n\n********** ALL DONE! **********{Style.NORMAL}")
     primt(f"\n{IMAGES_FOUND} artworks located in {int(elapsed_seconds)} seconds ({elapsed_minutes:.2f} minutes) at a rate of {images_located_per_minute:.2f} per minute\n")
     primt(f"{API_CALLS_MADE} API calls made, finding {RESULTS_FOUND} results.\n")
+    token_cache, match_cache = token_set_of.cache_info(), cached_token_set_ratio.cache_info()
+    if match_cache.hits or token_cache.hits:
+        primt(f"{match_cache.hits} of {match_cache.hits + match_cache.misses} fuzzy matches had been made before, and {token_cache.hits} of the {token_cache.hits + token_cache.misses} strings in the rest had already been normalized and tokenized, so they came from our caches.\n")
+    if SONGS_RESUMED: primt(f"{SONGS_RESUMED} songs had already been finished by an interrupted run, so they were replayed from {JOURNAL_FILE} instead of being researched again.\n")
+    if DUPLICATE_RESULTS_MERGED: primt(f"{DUPLICATE_RESULTS_MERGED} duplicate results (the same release found by more than one query) were merged, so each release was only scored once.\n")
+    if API_CALLS_REVALIDATED: primt(f"{API_CALLS_REVALIDATED} of those were cheap revalidations of expired cache entries that Discogs said hadn't changed (304).\n")
     if (API_CALLS_MADE+API_CALLS_SAVED_BY_CACHING) != 0:
         primt(f"{API_CALLS_SAVED_BY_CACHING} API calls were saved via {CACHE_HITS} cache hits ({round((API_CALLS_SAVED_BY_CACHING/(API_CALLS_MADE+API_CALLS_SAVED_BY_CACHING))*100)}% savings).")
     primt(f"{Fore.BLUE}{THROTTLE_API_CALLS_LEFT} API calls were remaining at the moment of the very last request.")
-    primt(f"\n{Style.BRIGHT}{Fore.RED}——————————————————————> Time to run get-art.bat !!!!!!!!!!!!!!!!!!!!!!!!!!!!")
+    primt(f"{Fore.BLUE}{DISCOGS_RATE_LIMITER.seconds_slept:.1f} seconds were spent waiting on the Discogs API rate limiter.")
+    if EARLY_STOP_PAGINATION: primt(f"{Fore.BLUE}{PAGES_SKIPPED_EARLY} pages were skipped by stopping pagination early.")
+    if isinstance(HTTP_SESSION, discogs_replay.ReplaySession): primt(f"{Fore.BLUE}Replayed from {DISCOGS_FIXTURES}: {HTTP_SESSION.stand_in.misses} requests had no recorded response.")
+    if isinstance(HTTP_SESSION, discogs_replay.RecordingSession): primt(f"{Fore.BLUE}Every request & response was recorded into {DISCOGS_FIXTURES}.")
+    profile_report()
+    if TRACE_RUN: primt(f"{Fore.BLUE}Every song, query & API call was traced into {TRACE_FILE} -- run \"python trace_summary.py\" to see where the time went.")
+    if DOWNLOAD_INTERNALLY:
+        counts = IMAGE_DOWNLOADER.counts
+        primt(f"{Fore.GREEN}{counts['downloaded']} images downloaded, {counts['already there']} were already there, and {Fore.RED if counts['failed'] else ''}{counts['failed']} failed{Fore.GREEN}, after {IMAGE_DOWNLOADER.rate_limiter.seconds_slept:.1f} seconds spent waiting on the image rate limiter.{Fore.WHITE}")
+    if WRITE_DOWNLOAD_SCRIPT and not DOWNLOAD_INTERNALLY: primt(f"\n{Style.BRIGHT}{Fore.RED}——————————————————————> Time to run get-art.bat !!!!!!!!!!!!!!!!!!!!!!!!!!!!")
+    trace_event("run", seconds=round(elapsed_seconds, 4), images_found=IMAGES_FOUND, results_found=RESULTS_FOUND, api_calls_made=API_CALLS_MADE, api_calls_saved_by_caching=API_CALLS_SAVED_BY_CACHING,
+                api_calls_revalidated=API_CALLS_REVALIDATED, throttle_seconds=round(DISCOGS_RATE_LIMITER.seconds_slept, 4), pages_skipped_early=PAGES_SKIPPED_EARLY, duplicate_results_merged=DUPLICATE_RESULTS_MERGED,
+                songs_resumed=SONGS_RESUMED)
 
 
 
@@ -1061,14 +2161,38 @@ def final_report(start_time):
 def main():
     start_time = get_platform_info()                    # setup computer, start timer
     delete_files_from_prevous_run()                     # setup logfile, roll previously-generated logfiles & scripts
+    open_song_journal()                                 # pick up where the last run stopped, if it got interrupted
     initialize_download_script()                        # setup output script which will download cover art
     process_all_music_files()                           # research every music file, locate cover art, add to download script
+    IMAGE_DOWNLOADER.finish()                           # wait for the last of our own downloads, if we're doing them
+    SONG_JOURNAL.close()                                # every song is finished, so the next run starts afresh instead of resuming this one
     clean_up_zero_byte_downloads()                      # close output script, clean up failed 0-byte downloads
+    close_api_cache()                                   # flush & close our persistent API cache so the next run can reuse it
     final_report(start_time)                            # report stats, artwork downloaded, cache hits, time elapsed, etc
+    LOG_WRITER  .release()                              # make sure every last line of our log (and trace) is on disk
+    TRACE_WRITER.release()
+
+
+
+
+
+def parse_command_line():                               # every option lives up top, but these are handy to have without editing anything
+    global PROFILE_RUN, PROFILE_SONG, RESUME_INTERRUPTED_RUN, RESUME_RETRY_FAILURES
+    parser = argparse.ArgumentParser(description="Finds cover art on Discogs for every mp3/flac in the current folder, and writes get-art.bat to download it.")
+    parser.add_argument("--profile"       , action="store_true", help="time our main stages, and report where the time went (same as PROFILE_RUN = True)")
+    parser.add_argument("--profile-song"  , metavar="FILENAME" , help="also capture cProfile & tracemalloc while researching songs whose filename contains this (same as PROFILE_SONG)")
+    parser.add_argument("--fresh"         , action="store_true", help="start over, even if the last run was interrupted (same as RESUME_INTERRUPTED_RUN = False)")
+    parser.add_argument("--retry-failures", action="store_true", help="when resuming an interrupted run, research the songs it found nothing for again (same as RESUME_RETRY_FAILURES = True)")
+    arguments = parser.parse_args()
+    PROFILE_RUN            = PROFILE_RUN  or arguments.profile
+    PROFILE_SONG           = PROFILE_SONG or arguments.profile_song
+    RESUME_INTERRUPTED_RUN = RESUME_INTERRUPTED_RUN and not arguments.fresh
+    RESUME_RETRY_FAILURES  = RESUME_RETRY_FAILURES  or arguments.retry_failures
 
 
 
 
 
 if __name__ == "__main__":
+    parse_command_line()
     main()
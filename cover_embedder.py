@@ -1,28 +1,33 @@
-import os
-import glob
-import re
+import collections
+from companion_index import CompanionIndex
 
 #ommand_template = 'eyed3.exe --add-image="{jpgfilename}:FRONT_COVER" "{audiofilename}"'            # this one only works for mp3s
 command_template = 'call add-art-to-song "{jpgfilename}" "{audiofilename}"'                         # this one uses my BAT wrapper that looks at the extension and runs the appropriate subordinate functoinality for the appropriate file type
 
-audio_files = glob.glob('*.mp3') + glob.glob('*.flac')                                              # Get a list of all audio files (mp3 and flac) in the current folder
+index       = CompanionIndex(".")                                                                    # One scan of the folder finds every song's companion images
+audio_files = index.audio_files([".mp3"]) + index.audio_files([".flac"])                            # Get a list of all audio files (mp3 and flac) in the current folder
 
-def find_jpg(base_filename):
-    jpg_regex = re.compile(fr'{re.escape(base_filename)}[AB]?\d*\.jpg', re.IGNORECASE)
-    for jpg_file in glob.glob('*.jpg'):
-        if jpg_regex.match(jpg_file):
-            return jpg_file
-    return None
+matches     = {audio_file: index.companion_images(audio_file, extensions=[".jpg"]) for audio_file in audio_files}     # Each song's JPGs, best first (the plain or A-side one before any B-sides), falling back to the name without its last character [for some reason I saw this happen in the wild]
+claimed     = collections.Counter(jpg_files[0] for jpg_files in matches.values() if jpg_files)                          # How many songs would get each JPG -- more than one means a truncated name matched the wrong song
+ambiguous   = 0
+
+def why_ambiguous(audio_file):                                                                      # Returns why we aren't sure about a song's JPG, or None if we are
+    jpg_files, reasons = matches[audio_file], []
+    if len(jpg_files)          > 1: reasons.append(f"also found {', '.join(jpg_files[1:])}")
+    if claimed[jpg_files[0]]   > 1: reasons.append(f"{claimed[jpg_files[0]] - 1} other song(s) would get the same JPG")
+    return " and ".join(reasons) or None
 
 with open('embed-art.bat', 'w') as bat_file:                                                        # Open the bat file for writing
     bat_file.write("@Echo OFF\n\n")
     for audio_file in audio_files:                                                                  # Iterate over audio files
-        base_filename = os.path.splitext(audio_file)[0]                                             # Get the base filename without the extension
-        jpg_filename = None
-        if jpg_filename is None: jpg_filename = find_jpg(base_filename     )                        # Search for a similarly named JPG
-        if jpg_filename is None: jpg_filename = find_jpg(base_filename[:-1])                        # Search for a similarly named JPG without the last character of the original name [for some reason I saw this happen in the wild]
+        jpg_filename = matches[audio_file][0] if matches[audio_file] else None
         if jpg_filename:                                                                            # Generate the command using the template and the filenames
-            print(f"     - yes companion jpg: {audio_file}")
+            reason = why_ambiguous(audio_file)
+            if reason:                                                                              # Rather than quietly going with whichever came first, say so
+                ambiguous += 1
+                print(f"     - ?? ambiguous jpg : {audio_file} -- using {jpg_filename}, but {reason}")
+            else:
+                print(f"     - yes companion jpg: {audio_file}")
             command = command_template.format(jpgfilename=jpg_filename, audiofilename=audio_file)
             bat_file.write(command + '\n')                                                          # Write the command to the bat file
             bat_file.write('call divider\n')                                                        # divider.bat is just a cosmetic script that draws a horizontal divider line to separate output into sections
@@ -31,4 +36,5 @@ with open('embed-art.bat', 'w') as bat_file:
     bat_file.write("\ndel /p get-art*.*\n\n")                                                       # Ask if we want to clean up after our past selves
     bat_file.write("\ndel /p embed-art.bat\n\n")                                                    # Ask if we want to clean up after our past selves - not sure if we can delete a file while running it though 😉
 
+if ambiguous: print(f"* {ambiguous} songs had more than one possible JPG (marked ?? above) -- delete the wrong ones and run this again, or check embed-art.bat before running it.")
 print("* You may now run embed-art.bat -- which has been freshly created. It will embed all the art.")
@@ -0,0 +1,194 @@
+"""
+TITLE: Discogs data dump index (discogs_dump.py)
+
+PURPOSE: An offline alternative to the Discogs search API, built from the monthly Discogs releases XML data dump
+         (https://data.discogs.com/).  The live API caps us at 60 lookups a minute, which makes a large library a
+         day-long run.  Searching a local index takes milliseconds instead.
+
+USAGE:
+    Step 1: Download a releases dump, i.e. discogs_20240101_releases.xml.gz -- no need to decompress it.
+    Step 2: python discogs_dump.py discogs_20240101_releases.xml.gz
+            This stream-parses the dump (it never has to fit in memory) into discogs-dump.sqlite.
+            The full dump makes for a big index, so --formats and --until-year can be used to only keep what we care about,
+            i.e.:  python discogs_dump.py discogs_20240101_releases.xml.gz --formats Shellac,Vinyl --until-year 1960
+    Step 3: set SEARCH_BACKEND = "dump" in cover_downloader.py
+            Searches then run against the index.  The API is still used for release data (images, B-sides),
+            because the dumps no longer include image URLs.
+
+WHAT IS IN THE INDEX:
+    * releases: id, artist, title, year, image URIs (when the dump has them), tracklist positions & titles
+    * release_tokens: an inverted index of normalized words in each release's artist & title (track titles count as title),
+                      which is how we answer the same artist / title / year / q queries that we send to the API
+"""
+
+import os
+import re
+import sys
+import gzip
+import json
+import sqlite3
+import argparse
+import threading
+import unicodedata
+import xml.etree.ElementTree as ElementTree
+
+DEFAULT_INDEX_FILE = "discogs-dump.sqlite"
+INSERT_BATCH_SIZE  = 10000                   #how many releases to parse before writing them to the index in one transaction
+RESULTS_PER_PAGE   = 100                     #same as the maximum the API gives us
+
+CONNECTIONS = threading.local()              #searches happen from several threads at once, and each thread needs its own sqlite connection
+
+
+
+
+def normalize_tokens(text):                  #"Paul Whiteman & His Orchestra" -> ["paul", "whiteman", "his", "orchestra"]
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(character for character in text if not unicodedata.combining(character))
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def strip_disambiguation(name):              #Discogs tells apart artists of the same name as "Name (2)", "Name (3)", etc
+    return re.sub(r" \(\d+\)$", "", name or "").strip()
+
+
+
+
+def create_index(db):
+    db.execute("CREATE TABLE IF NOT EXISTS releases (id INTEGER PRIMARY KEY, artist TEXT, title TEXT, year TEXT, images TEXT, tracklist TEXT)")
+    db.execute("CREATE TABLE IF NOT EXISTS release_tokens (field TEXT, token TEXT, release_id INTEGER, PRIMARY KEY (field, token, release_id)) WITHOUT ROWID")
+
+
+def parse_release(element):                  #returns a dict of the handful of things we care about from one <release> element
+    artists = []
+    for artist in element.findall("artists/artist"):
+        name = strip_disambiguation(artist.findtext("name"))
+        join = (artist.findtext("join") or "").strip()
+        if name: artists.append((name, join))
+    artist = ""
+    for i, (name, join) in enumerate(artists):
+        artist += name
+        if i < len(artists) - 1: artist += f" {join} " if join and join != "," else ", "
+    released = element.findtext("released") or ""
+    return {
+        "id"       : int(element.get("id")),
+        "artist"   : re.sub(r" {2,}", " ", artist).strip(),
+        "title"    : (element.findtext("title") or "").strip(),
+        "year"     : released[:4] if re.match(r"^\d{4}", released) and not released.startswith("0000") else "",
+        "formats"  : [fmt.get("name", "") for fmt in element.findall("formats/format")],
+        "images"   : [{"type": image.get("type", ""), "uri": image.get("uri", "")} for image in element.findall("images/image")],
+        "tracklist": [[track.findtext("position") or "", track.findtext("title") or ""] for track in element.findall("tracklist/track")],
+    }
+
+
+def wanted(release, formats, until_year):
+    if formats and not any(fmt in formats for fmt in release["formats"]): return False
+    if until_year and release["year"] and int(release["year"]) > until_year: return False
+    return True
+
+
+def write_releases(db, releases):
+    db.executemany("INSERT OR REPLACE INTO releases (id, artist, title, year, images, tracklist) VALUES (?, ?, ?, ?, ?, ?)",
+                   [(release["id"], release["artist"], release["title"], release["year"], json.dumps(release["images"]), json.dumps(release["tracklist"])) for release in releases])
+    tokens = set()
+    for release in releases:
+        for token in normalize_tokens(release["artist"]): tokens.add(("artist", token, release["id"]))
+        for token in normalize_tokens(" ".join([release["title"]] + [track_title for _, track_title in release["tracklist"]])):
+            tokens.add(("title", token, release["id"]))
+    db.executemany("INSERT OR IGNORE INTO release_tokens (field, token, release_id) VALUES (?, ?, ?)", tokens)
+
+
+def build_index(dump_path, index_path=DEFAULT_INDEX_FILE, formats=None, until_year=None, progress=None):     #stream-parses a releases dump (.xml or .xml.gz) into our index, returns how many releases were indexed
+    opener = gzip.open if dump_path.endswith(".gz") else open
+    db = sqlite3.connect(index_path)
+    create_index(db)
+    indexed, batch = 0, []
+    with opener(dump_path, "rb") as dump:
+        events = ElementTree.iterparse(dump, events=("start", "end"))
+        _, root = next(events)
+        for event, element in events:
+            if event != "end" or element.tag != "release": continue
+            release = parse_release(element)
+            root.clear()                                                    #this is what keeps memory flat no matter how big the dump is
+            if not wanted(release, formats, until_year): continue
+            batch.append(release)
+            if len(batch) >= INSERT_BATCH_SIZE:
+                with db: write_releases(db, batch)
+                indexed += len(batch)
+                batch = []
+                if progress: progress(indexed)
+    if batch:
+        with db: write_releases(db, batch)
+        indexed += len(batch)
+        if progress: progress(indexed)
+    db.close()
+    return indexed
+
+
+
+
+def get_connection(index_path):
+    connections = getattr(CONNECTIONS, "by_path", None)
+    if connections is None: connections = CONNECTIONS.by_path = {}
+    if index_path not in connections:
+        if not os.path.exists(index_path): raise FileNotFoundError(f"No Discogs dump index at {index_path} -- build one with: python discogs_dump.py <releases dump>")
+        connections[index_path] = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True)
+    return connections[index_path]
+
+
+def search(params, page=1, index_path=DEFAULT_INDEX_FILE, per_page=RESULTS_PER_PAGE):
+    #answers the same artist / title / year / q queries that we send to the search API, in the same shape the API answers them:
+    #{"results": [{"id", "title": "Artist - Title", "year", "cover_image", "resource_url", ...}], "pagination": {"page", "pages", "items"}}
+    token_conditions, where, arguments = [], [], []
+    for key, value in params.items():
+        if value is None or key in ("page", "per_page"): continue
+        if   key == "artist": token_conditions += [(("artist",), token) for token in normalize_tokens(value)]
+        elif key == "title" : token_conditions += [(("artist", "title"), token) for token in normalize_tokens(value)]     #the API's title search is over the combined "Artist - Title"
+        elif key == "q"     : token_conditions += [(("artist", "title"), token) for token in normalize_tokens(value)]
+        elif key == "year"  :
+            where.append("year = ?")
+            arguments.append(str(value))
+    if not token_conditions: return {"results": [], "pagination": {"page": page, "pages": 0, "items": 0}}
+
+    for fields, token in token_conditions:
+        where.append(f"id IN (SELECT release_id FROM release_tokens WHERE token = ? AND field IN ({','.join('?' * len(fields))}))")
+        arguments += [token] + list(fields)
+    where_clause = " AND ".join(where)
+
+    db = get_connection(index_path)
+    items = db.execute(f"SELECT COUNT(*) FROM releases WHERE {where_clause}", arguments).fetchone()[0]
+    rows  = db.execute(f"SELECT id, artist, title, year, images, tracklist FROM releases WHERE {where_clause} ORDER BY id LIMIT ? OFFSET ?",
+                       arguments + [per_page, (page - 1) * per_page]).fetchall()
+    results = []
+    for release_id, artist, title, year, images, tracklist in rows:
+        images = json.loads(images)
+        cover_image = next((image["uri"] for image in images if image["type"] == "primary" and image["uri"]), "")
+        results.append({
+            "id"          : release_id,
+            "type"        : "release",
+            "title"       : f"{artist} - {title}",
+            "year"        : year,
+            "cover_image" : cover_image,
+            "resource_url": f"https://api.discogs.com/releases/{release_id}",
+            "tracklist"   : json.loads(tracklist),
+        })
+    return {"results": results, "pagination": {"page": page, "pages": (items + per_page - 1) // per_page, "items": items}}
+
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Builds a local search index from a Discogs releases XML data dump.")
+    parser.add_argument("dump", help="the releases dump, i.e. discogs_20240101_releases.xml.gz")
+    parser.add_argument("index", nargs="?", default=DEFAULT_INDEX_FILE, help=f"the index to create or add to (default: {DEFAULT_INDEX_FILE})")
+    parser.add_argument("--formats", help="only index releases in these comma-separated formats, i.e. Shellac,Vinyl")
+    parser.add_argument("--until-year", type=int, help="only index releases from this year or earlier (releases with no year are always kept)")
+    args = parser.parse_args()
+
+    formats = set(args.formats.split(",")) if args.formats else None
+    indexed = build_index(args.dump, args.index, formats=formats, until_year=args.until_year, progress=lambda count: print(f"...{count} releases indexed", end="\r"))
+    print(f"\n* {indexed} releases indexed into {args.index}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""
+TITLE: Discogs record & replay (discogs_replay.py)
+
+PURPOSE: Lets cover_downloader.py run without the live Discogs API, so that performance experiments are fast and repeatable.
+         Record a run once, then replay it as often as you like -- no DISCOGS_TOKEN, no network, the very same responses.
+
+USAGE:
+    Step 1: set DISCOGS_TRAFFIC = "record" in cover_downloader.py and run it as normal.
+            Every request & response -- searches, release data, image downloads, rate-limit headers and all --
+            gets saved into discogs-fixtures.sqlite
+    Step 2: set DISCOGS_TRAFFIC = "replay" and run it again. Responses now come from the fixtures, in-process,
+            with however much latency / rate limiting / 429s you ask for with REPLAY_LATENCY_SECONDS, REPLAY_RATE_LIMIT
+            and REPLAY_CHANCE_OF_429.
+            NOTE: our own cache (get-art.cache.sqlite) still answers first, so move it out of the way for a cold run.
+    Or, to replay over a real socket instead of in-process:
+            python discogs_replay.py --port 8765 --latency 0.2 --rate-limit 60 --chance-of-429 0.05
+            and set REPLAY_SERVER_URL = "http://127.0.0.1:8765" in cover_downloader.py
+
+HOW THE STAND-IN BEHAVES:
+    * it keeps its own one-minute window of requests, and answers with X-Discogs-Ratelimit / -Used / -Remaining headers
+      from it, just like Discogs.  Going over REPLAY_RATE_LIMIT gets a 429 with a Retry-After, just like Discogs.
+    * a conditional request (If-None-Match) for a release whose ETag hasn't changed gets a 304
+    * a search that was never recorded gets no results; anything else that was never recorded gets a 404
+"""
+
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import threading
+import collections
+import http.client
+import http.server
+import urllib.parse
+import requests
+from requests.structures import CaseInsensitiveDict
+
+DEFAULT_FIXTURE_FILE = "discogs-fixtures.sqlite"
+DEFAULT_PORT         = 8765
+NOT_REPLAYED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}     #what we recorded was already decoded, so these no longer describe it
+
+
+
+
+def request_key(url, params):                #the same request always gets the same key, however its params were handed to us
+    pairs = sorted((str(key), str(value)) for key, value in (params or {}).items() if value is not None)           #requests leaves out None params, too
+    return url, json.dumps(pairs)
+
+
+class FixtureStore:
+    """
+    Every response we've recorded, by request.  Recording the same request again replaces what we had.
+    """
+
+    def __init__(self, path=DEFAULT_FIXTURE_FILE):
+        self.db   = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.lock = threading.Lock()
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS exchanges (url TEXT, params TEXT, status INTEGER, headers TEXT, body BLOB, recorded_at REAL, PRIMARY KEY (url, params))")
+
+    def put(self, url, params, status, headers, body):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO exchanges (url, params, status, headers, body, recorded_at) VALUES (?, ?, ?, ?, ?, ?)",
+                            request_key(url, params) + (status, json.dumps(dict(headers)), body, time.time()))
+
+    def get(self, url, params):              #returns (status, headers, body), or None if we never recorded this request
+        with self.lock:
+            row = self.db.execute("SELECT status, headers, body FROM exchanges WHERE url = ? AND params = ?", request_key(url, params)).fetchone()
+        if row is None: return None
+        return row[0], json.loads(row[1]), bytes(row[2])
+
+    def close(self):
+        with self.lock: self.db.close()
+
+
+
+
+class RecordingSession:
+    """
+    Stands in for our requests.Session: passes every request on to the real one, and saves what comes back.
+    Only real answers are saved -- 304s and 429s say more about when we asked than about what we asked for.
+    """
+
+    def __init__(self, session, store):
+        self.session = session
+        self.store   = store
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        response = self.session.get(url, headers=headers, params=params, timeout=timeout)
+        if response.status_code not in (304, 429): self.store.put(url, params, response.status_code, response.headers, response.content)
+        return response
+
+
+class StandIn:
+    """
+    Plays Discogs' part, from our fixtures: optional latency, rate-limit headers from its own one-minute window, and 429s
+    for going over that limit (or just at random, to see how we cope).
+    """
+
+    def __init__(self, store, latency=0, rate_limit=60, chance_of_429=0, retry_after=1, seed=None):          #pylint: disable=R0913
+        self.store         = store
+        self.latency       = latency
+        self.rate_limit    = rate_limit
+        self.chance_of_429 = chance_of_429
+        self.retry_after   = retry_after
+        self.random        = random.Random(seed)
+        self.recent        = collections.deque()          #when each request of the last minute came in
+        self.misses        = 0                            #requests we had no fixture for
+        self.lock          = threading.Lock()
+
+    def respond(self, url, params, headers=None):        #returns (status, headers, body) for one request
+        with self.lock:
+            delay = self.latency * self.random.uniform(0.5, 1.5)
+            now   = time.monotonic()
+            while self.recent and now - self.recent[0] >= 60: self.recent.popleft()
+            limited = len(self.recent) >= self.rate_limit or self.random.random() < self.chance_of_429
+            if not limited: self.recent.append(now)
+            used = len(self.recent)
+        if delay: time.sleep(delay)
+        rate_headers = {"X-Discogs-Ratelimit": str(self.rate_limit), "X-Discogs-Ratelimit-Used": str(used), "X-Discogs-Ratelimit-Remaining": str(max(self.rate_limit - used, 0))}
+        if limited: return 429, {**rate_headers, "Retry-After": str(self.retry_after), "Content-Type": "application/json"}, b'{"message": "You are making requests too quickly."}'
+
+        fixture = self.store.get(url, params)
+        if fixture is None:
+            with self.lock: self.misses += 1
+            if url.endswith("/database/search"):
+                no_results = {"results": [], "pagination": {"page": int((params or {}).get("page", 1)), "pages": 0, "items": 0}}
+                return 200, {**rate_headers, "Content-Type": "application/json"}, json.dumps(no_results).encode()
+            return 404, {**rate_headers, "Content-Type": "application/json"}, b'{"message": "The requested resource was not found."}'
+
+        status, recorded_headers, body = fixture
+        response_headers = {**{key: value for key, value in recorded_headers.items() if key.lower() not in NOT_REPLAYED_HEADERS}, **rate_headers}
+        etag = CaseInsensitiveDict(recorded_headers).get("ETag")
+        if etag and etag == CaseInsensitiveDict(headers or {}).get("If-None-Match"): return 304, response_headers, b""
+        return status, response_headers, body
+
+
+class ReplaySession:
+    """
+    Stands in for our requests.Session, in-process: every request is answered by our StandIn, as a real requests.Response.
+    """
+
+    def __init__(self, stand_in):
+        self.stand_in = stand_in
+
+    def get(self, url, headers=None, params=None, timeout=None):                                   #pylint: disable=W0613
+        status, response_headers, body = self.stand_in.respond(url, params, headers)
+        response             = requests.Response()
+        response.status_code = status
+        response.reason      = http.client.responses.get(status, "")
+        response.headers     = CaseInsensitiveDict(response_headers)
+        response.url         = requests.Request("GET", url, params=params).prepare().url
+        response.encoding    = "utf-8"
+        response._content    = body                                                                #pylint: disable=W0212
+        return response
+
+
+class RedirectingSession:
+    """
+    Stands in for our requests.Session, sending every request to our stand-in server instead of to wherever it was going.
+    """
+
+    def __init__(self, session, server_url):
+        self.session    = session
+        self.server_url = server_url.rstrip("/")
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        return self.session.get(f"{self.server_url}/{url}", headers=headers, params=params, timeout=timeout)
+
+
+
+
+class StandInRequestHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):                                                                              #pylint: disable=C0103
+        original = urllib.parse.urlsplit(self.path[1:])                                            #i.e. /https://api.discogs.com/database/search?q=...
+        url      = urllib.parse.urlunsplit((original.scheme, original.netloc, original.path, "", ""))
+        params   = dict(urllib.parse.parse_qsl(original.query, keep_blank_values=True))
+        status, headers, body = self.server.stand_in.respond(url, params, dict(self.headers))
+        self.send_response(status)
+        for key, value in headers.items(): self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):                                                          #pylint: disable=W0622
+        pass                                                                                       #a line per request would drown out everything else
+
+
+def serve(stand_in, port=DEFAULT_PORT):                                                             #blocks, answering requests until interrupted
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), StandInRequestHandler)
+    server.stand_in = stand_in
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serves recorded Discogs responses over HTTP, for replaying cover_downloader.py runs.")
+    parser.add_argument("fixtures", nargs="?", default=DEFAULT_FIXTURE_FILE, help=f"the recorded responses (default: {DEFAULT_FIXTURE_FILE})")
+    parser.add_argument("--port"         , type=int  , default=DEFAULT_PORT, help=f"port to listen on, on 127.0.0.1 (default: {DEFAULT_PORT})")
+    parser.add_argument("--latency"      , type=float, default=0 , help="seconds each response takes, give or take half (default: 0)")
+    parser.add_argument("--rate-limit"   , type=int  , default=60, help="requests a minute allowed before answering 429 (default: 60, like Discogs)")
+    parser.add_argument("--chance-of-429", type=float, default=0 , help="chance of any request getting a 429 anyway, i.e. 0.05 (default: 0)")
+    parser.add_argument("--seed"         , type=int  , help="seed for the latency & 429 dice, so runs can be repeated")
+    args = parser.parse_args()
+
+    stand_in = StandIn(FixtureStore(args.fixtures), latency=args.latency, rate_limit=args.rate_limit, chance_of_429=args.chance_of_429, seed=args.seed)
+    print(f"* Replaying {args.fixtures} on http://127.0.0.1:{args.port} -- set REPLAY_SERVER_URL to that in cover_downloader.py (Ctrl-C to stop)")
+    try:
+        serve(stand_in, args.port)
+    except KeyboardInterrupt:
+        pass
+    print(f"* Done. {stand_in.misses} requests had no recorded response.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+import collections
+
+import pytest
+
+import cover_downloader
+
+
+@pytest.fixture
+def api_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(cover_downloader, "API_CACHE_FILE"       , str(tmp_path / "get-art.cache.sqlite"))
+    monkeypatch.setattr(cover_downloader, "API_CACHE"            , collections.OrderedDict())
+    monkeypatch.setattr(cover_downloader, "API_CACHE_MEMORY_SIZE", 0)
+    monkeypatch.setattr(cover_downloader, "API_CACHE_TOUCHED"    , {})
+    yield cover_downloader
+    cover_downloader.close_api_cache()
+
+
+def page(results):
+    return [{"id": i, "title": f"Artist - Title {i}"} for i in range(results)], {"pages": 1, "page": 1}, {}
+
+
+def test_memory_front_is_capped_in_results_not_pages(api_cache, monkeypatch):
+    monkeypatch.setattr(api_cache, "API_CACHE_MEMORY_RESULTS", 1000)
+    for i in range(30): api_cache.api_cache_put(f"page{i}", page(100), 14)
+    assert api_cache.API_CACHE_MEMORY_SIZE == 1000
+    assert list(api_cache.API_CACHE) == [f"page{i}" for i in range(20, 30)]
+    api_cache.api_cache_put("release", {"release_data": {"id": 1}}, 90)                   #release data counts as one result
+    assert api_cache.API_CACHE_MEMORY_SIZE == 901
+
+
+def test_evicted_pages_are_still_served_from_sqlite(api_cache, monkeypatch):
+    monkeypatch.setattr(api_cache, "API_CACHE_MEMORY_RESULTS", 100)
+    for i in range(3): api_cache.api_cache_put(f"page{i}", page(100), 14)
+    assert "page0" not in api_cache.API_CACHE
+    results, pagination, _ = api_cache.api_cache_get("page0")
+    assert len(results) == 100 and pagination["pages"] == 1
+    assert list(api_cache.API_CACHE) == ["page0"]                                          #promoted back, pushing the others out
+    assert api_cache.API_CACHE_MEMORY_SIZE == 100
+
+
+def test_size_cap_evicts_least_recently_used(api_cache, monkeypatch):
+    monkeypatch.setattr(api_cache, "API_CACHE_MEMORY_RESULTS", 1)
+    monkeypatch.setattr(api_cache, "API_CACHE_MAX_ENTRIES"   , 3)
+    for i in range(4): api_cache.api_cache_put(f"page{i}", page(1), 14)
+    api_cache.api_cache_get("page0")                                                      #from SQLite, so its use is only noted for now...
+    api_cache.close_api_cache()                                                            #...and written out before evicting
+    assert api_cache.api_cache_get("page0") is not None
+    assert api_cache.api_cache_get("page1") is None
@@ -0,0 +1,32 @@
+import os
+import json
+
+import benchmark_matching
+
+FIXTURES     = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+GOLDEN       = os.path.join(FIXTURES, "golden.jsonl")
+GOLDEN_PICKS = os.path.join(FIXTURES, "golden_picks.json")     #made with: python benchmark_matching.py --corpus tests/fixtures/golden.jsonl --save-picks tests/fixtures/golden_picks.json
+
+
+def test_scoring_changes_do_not_change_picks():
+    corpus = benchmark_matching.load_corpus(GOLDEN)
+    picks, scored = benchmark_matching.score_corpus(corpus)
+    with open(GOLDEN_PICKS, encoding="utf-8") as picks_file: expected = json.load(picks_file)
+    assert scored == 68
+    assert json.loads(json.dumps(picks)) == expected             #if a scorer change means to change picks, look at why, then --save-picks again
+
+
+def test_first_pass_finds_every_expected_release():
+    corpus = benchmark_matching.load_corpus(GOLDEN)
+    picks, _ = benchmark_matching.score_corpus(corpus)
+    assert [picks[song["filename"]][1][0] for song in corpus] == [song["expected_release_id"] for song in corpus]
+
+
+def test_page_keeper_keeps_each_query_its_own_pages():
+    first, second = {}, {}
+    keep_first, keep_second = benchmark_matching.page_keeper(first), benchmark_matching.page_keeper(second)
+    assert keep_first(1, ["a"]) == (-1, -1)
+    keep_second(1, ["b"])
+    keep_first(2, ["c"])
+    assert first == {1: ["a"], 2: ["c"]}
+    assert second == {1: ["b"]}
@@ -0,0 +1,59 @@
+import os
+import sys
+import subprocess
+
+from companion_index import CompanionIndex
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_files(folder, names, empty=()):
+    for name in names:
+        with open(os.path.join(folder, name), "wb") as file:
+            if name not in empty: file.write(b"x")
+
+
+def test_downloader_side_names_for_a_song_ending_in_a_letter(tmp_path):
+    #cover_downloader.py's modify_filename_with_letter() swaps a last letter for the side: "Moonlight" -> "MoonlighA", "MoonlighB1"
+    sides = ["Lee Morse - MoonlighA.jpg"] + [f"Lee Morse - MoonlighB{number}.jpg" for number in range(1, 9)]
+    make_files(tmp_path, ["Lee Morse - Moonlight.mp3"] + sides)
+    index = CompanionIndex(str(tmp_path))
+    assert index.has_companion("Lee Morse - Moonlight.mp3")
+    assert index.family("Lee Morse - Moonlight.mp3") == sorted(["Lee Morse - Moonlight.mp3"] + sides)
+
+
+def test_downloader_side_names_for_a_song_ending_in_a_year(tmp_path):
+    names = ["Lee Morse - Dallas Blues (1925).mp3", "Lee Morse - Dallas Blues (1925)A.jpg", "Lee Morse - Dallas Blues (1925)B1.jpg", "Lee Morse - Dallas Blues (1925)B2.jpg"]
+    make_files(tmp_path, names)
+    index = CompanionIndex(str(tmp_path))
+    assert index.companion_images(names[0]) == names[1:]
+    assert index.family(names[0]) == sorted(names)
+
+
+def test_family_includes_art_under_the_truncated_base_name(tmp_path):
+    make_files(tmp_path, ["Lee Morse - Dallas Blues (1925).mp3", "Lee Morse - Dallas Blues (1925.jpg"])
+    index = CompanionIndex(str(tmp_path))
+    assert index.companion_images("Lee Morse - Dallas Blues (1925).mp3") == ["Lee Morse - Dallas Blues (1925.jpg"]
+    assert "Lee Morse - Dallas Blues (1925.jpg" in index.family("Lee Morse - Dallas Blues (1925).mp3")
+
+
+def test_family_leaves_another_songs_art_alone(tmp_path):
+    make_files(tmp_path, ["Blues.mp3", "Blues.jpg", "Bluesy.mp3", "BluesyB1.jpg"])
+    index = CompanionIndex(str(tmp_path))
+    assert index.family("Bluesy.mp3") == ["Bluesy.mp3", "BluesyB1.jpg"]
+    assert index.family("Blues.mp3")  == ["Blues.jpg", "Blues.mp3"]
+
+
+def test_zero_byte_images_are_not_companions(tmp_path):
+    make_files(tmp_path, ["Song (1925).mp3", "Song (1925).jpg"], empty=["Song (1925).jpg"])
+    assert not CompanionIndex(str(tmp_path)).has_companion("Song (1925).mp3")
+
+
+def test_wedding_party_moves_songs_with_all_their_art(tmp_path):
+    moonlight = ["Lee Morse - Moonlight.mp3", "Lee Morse - MoonlighA.jpg", "Lee Morse - MoonlighB1.jpg", "Lee Morse - MoonlighB2.jpg"]
+    dallas    = ["Lee Morse - Dallas Blues (1925).mp3", "Lee Morse - Dallas Blues (1925.jpg"]
+    make_files(tmp_path, moonlight + dallas + ["Henry Burr - Lonely.mp3"])
+    subprocess.run([sys.executable, os.path.join(REPO, "wedding_party.py")], cwd=tmp_path, check=True, capture_output=True,
+                   env={**os.environ, "PYTHONPATH": REPO})
+    assert sorted(os.listdir(tmp_path / "married")) == sorted(moonlight + dallas)
+    assert "Henry Burr - Lonely.mp3" in os.listdir(tmp_path)
@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+import discogs_dump
+
+FIXTURE_DUMP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "releases.xml.gz")
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    path = str(tmp_path / "discogs-dump.sqlite")
+    assert discogs_dump.build_index(FIXTURE_DUMP, path) == 5
+    return path
+
+
+@pytest.fixture
+def early_shellac_and_vinyl_index_path(tmp_path):
+    path = str(tmp_path / "discogs-dump-filtered.sqlite")
+    assert discogs_dump.build_index(FIXTURE_DUMP, path, formats={"Shellac", "Vinyl"}, until_year=1960) == 4
+    return path
+
+
+def ids(answer):
+    return [result["id"] for result in answer["results"]]
+
+
+def test_search_answers_in_the_shape_of_the_api(index_path):
+    answer = discogs_dump.search({"artist": "Lee Morse", "title": "Moonlight"}, index_path=index_path)
+    assert answer["pagination"] == {"page": 1, "pages": 1, "items": 1}
+    result = answer["results"][0]
+    assert result["id"]           == 1
+    assert result["title"]        == "Lee Morse - Dallas Blues / Moonlight"          #"(2)" disambiguation dropped
+    assert result["year"]         == "1925"
+    assert result["cover_image"]  == "https://i.discogs.com/1-primary.jpg"
+    assert result["resource_url"] == "https://api.discogs.com/releases/1"
+    assert result["tracklist"]    == [["A", "Dallas Blues"], ["B", "Moonlight"]]
+
+
+def test_artists_are_joined_and_odd_dates_handled(index_path):
+    burr = discogs_dump.search({"artist": "Henry Burr"}, index_path=index_path)["results"][0]
+    assert burr["title"] == "Henry Burr & Peerless Quartet - You Forgot To Remember"
+    assert burr["year"]  == "1925"                                                  #from "1925-03-00"
+    bob = discogs_dump.search({"q": "Bob's Band"}, index_path=index_path)["results"][0]
+    assert bob["year"] == ""                                                        #"0000" means unknown
+    assert bob["cover_image"] == ""
+
+
+def test_title_search_covers_track_titles(index_path):
+    assert ids(discogs_dump.search({"title": "Dallas Blues"}, index_path=index_path)) == [1, 3, 4]
+
+
+def test_year_filter(index_path):
+    assert ids(discogs_dump.search({"title": "Dallas Blues", "year": "1925"}, index_path=index_path)) == [1]
+    assert ids(discogs_dump.search({"title": "Dallas Blues", "year": 1995},   index_path=index_path)) == [4]
+
+
+def test_format_and_year_filters_when_building(early_shellac_and_vinyl_index_path):
+    assert ids(discogs_dump.search({"artist": "Lee Morse"},    index_path=early_shellac_and_vinyl_index_path)) == [1]       #the 1995 CD is left out
+    assert ids(discogs_dump.search({"title": "Dallas Blues"}, index_path=early_shellac_and_vinyl_index_path)) == [1, 3]
+
+
+def test_paging_and_no_results(index_path):
+    first, second = (discogs_dump.search({"title": "Dallas Blues"}, page=page, index_path=index_path, per_page=2) for page in (1, 2))
+    assert ids(first) == [1, 3] and ids(second) == [4]
+    assert second["pagination"] == {"page": 2, "pages": 2, "items": 3}
+    assert discogs_dump.search({"artist": "Nobody At All"}, index_path=index_path)["results"] == []
+    assert discogs_dump.search({"year": "1925"}, index_path=index_path)["pagination"]["items"] == 0          #a year alone isn't a search
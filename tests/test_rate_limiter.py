@@ -0,0 +1,28 @@
+from cover_downloader import RateLimiter
+
+
+HEADERS = {'X-Discogs-Ratelimit': '60', 'X-Discogs-Ratelimit-Used': '1'}
+
+
+def test_plenty_remaining_leaves_the_bucket_alone():
+    limiter = RateLimiter(60, safety_margin=2, burst=3)
+    limiter.acquire()
+    limiter.update_from_headers({**HEADERS, 'X-Discogs-Ratelimit-Remaining': '59'})
+    assert limiter.tokens >= 2                                  #Discogs agrees we're well clear of the edge, so the drip stays at 58/min
+
+
+def test_fewer_remaining_than_we_expect_empties_the_bucket():
+    limiter = RateLimiter(60, safety_margin=2, burst=3)
+    limiter.update_from_headers({**HEADERS, 'X-Discogs-Ratelimit-Remaining': '1'})
+    assert limiter.tokens <= 1
+    limiter.update_from_headers({**HEADERS, 'X-Discogs-Ratelimit-Remaining': '0'})
+    assert limiter.tokens <= 0
+
+
+def test_time_slept_is_kept_per_limiter():
+    api, images = RateLimiter(600), RateLimiter(600)            #10/s, so the second call waits ~0.1s
+    images.acquire()
+    slept = images.acquire()
+    assert slept > 0
+    assert images.seconds_slept == slept
+    assert api.seconds_slept == 0
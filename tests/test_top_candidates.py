@@ -0,0 +1,43 @@
+import cover_downloader
+from cover_downloader import TopCandidates
+
+
+class Result:                                                   #stands in for a scored Candidate
+    def __init__(self, key, score):
+        self.key, self.score, self.score_2, self.found_by = key, score, score, []
+
+    def get(self, name, default=None):
+        return self.key if name == "id" else default
+
+
+def offer(candidates, key, score, query_index, name):
+    result = Result(key, score)
+    candidates.offer([result], query_index, 1, {"q": name})
+    return result
+
+
+def test_earlier_find_of_a_retained_release_records_its_query_once():
+    candidates = TopCandidates(2, lambda page_results: page_results)
+    offer(candidates, "A", 50, 1, "one")
+    earlier = offer(candidates, "A", 50, 0, "zero")              #pages arrive out of order: this is where A really comes first
+    assert earlier.found_by == [{"q": "one"}, {"q": "zero"}]
+    assert candidates.ranked("score") == [earlier]
+
+
+def test_earlier_find_of_a_released_release_keeps_its_earlier_queries():
+    candidates = TopCandidates(1, lambda page_results: page_results)
+    offer(candidates, "A", 50, 1, "one")
+    best = offer(candidates, "B", 90, 2, "two")                  #A falls out of both heaps
+    again = offer(candidates, "A", 50, 0, "zero")
+    assert again.found_by == [{"q": "one"}, {"q": "zero"}]
+    assert candidates.ranked("score") == [best]
+    assert candidates.distinct_results == 2
+
+
+def test_later_duplicates_only_add_their_query():
+    candidates = TopCandidates(2, lambda page_results: page_results)
+    first = offer(candidates, "A", 50, 0, "zero")
+    offer(candidates, "A", 50, 1, "one")
+    offer(candidates, "A", 50, 2, "one")
+    assert first.found_by == [{"q": "zero"}, {"q": "one"}]
+    assert cover_downloader.DUPLICATE_RESULTS_MERGED >= 2
@@ -0,0 +1,130 @@
+"""
+TITLE: Trace summary (trace_summary.py)
+
+PURPOSE: Makes sense of the trace that cover_downloader.py writes when TRACE_RUN is on.  Our final report only has totals;
+         this tells us which songs took the time, which stages of their research it went to, and which queries cost the most.
+
+USAGE:
+    Step 1: set TRACE_RUN = True in cover_downloader.py and run it as normal.  Every song, query & API call gets a line in get-art.trace.jsonl
+    Step 2: python trace_summary.py
+            or, for a trace from somewhere else, and more than the top 10 of everything:
+            python trace_summary.py some-other-folder/get-art.trace.jsonl --top 25
+
+WHAT IS IN THE TRACE (one JSON object per line, each with a "kind" and the time it was written "at"):
+    * api_call: every request we made to Discogs, or that our cache answered instead -- url, params, cache hit/miss/revalidated,
+                status, seconds taken, seconds of that spent waiting on the rate limiter, 429s along the way, and rate-limit headers
+    * query   : every search query of every song -- pages fetched, pages from cache, pages skipped by early stopping, seconds taken
+    * song    : every song -- seconds taken, seconds by stage, API calls & cache hits, basket size, best scores, and whether art was found
+    * plan    : our up-front query plan, when PLAN_LIBRARY_QUERIES is on
+    * image_download: every image we downloaded ourselves, when DOWNLOAD_INTERNALLY is on -- downloaded / already there / failed, tries, and bytes.
+                      The requests themselves are api_call records too, but against the image host's rate limit, not our API budget
+    * run     : the final totals
+"""
+
+import sys
+import json
+import argparse
+import collections
+
+DEFAULT_TRACE_FILE = "get-art.trace.jsonl"
+
+
+
+
+def load_trace(path):                        #returns every record in the trace, by kind; a line cut short by a crash is skipped, not fatal
+    records = collections.defaultdict(list)
+    with open(path, encoding="utf-8") as trace:
+        for line in trace:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            records[record.get("kind")].append(record)
+    return records
+
+
+def query_text(params):                      #{"artist": "Henry Burr", "page": 2} -> "artist=Henry Burr"
+    return ", ".join(f"{key}={value}" for key, value in params.items() if key != "page")
+
+
+def score_text(score):                       #scores come out of our fuzzy matching as ints or floats, but they're only ever whole numbers
+    return "-" if score is None else f"{score:.0f}"
+
+
+def percent(part, whole):
+    return f"{100 * part / whole:.0f}%" if whole else "-"
+
+
+
+
+def summarize_run(records, report):
+    image_urls = {download["url"] for download in records["image_download"]}
+    songs, api_calls = records["song"], [call for call in records["api_call"] if call["url"] not in image_urls]
+    made    = [call for call in api_calls if call["cache"] != "hit"]
+    seconds = sum(song["seconds"] for song in songs)
+    report(f"* {len(songs)} songs, {sum(song['found'] for song in songs)} with art found, {seconds:.1f} song-seconds in all")
+    report(f"* {len(made)} API calls made ({sum(call['cache'] == 'revalidated' for call in made)} of them revalidations), {len(api_calls) - len(made)} answered from our cache")
+    report(f"* {sum(call['throttle_seconds'] for call in made):.1f} seconds spent waiting on the rate limiter, {sum(call['retries_429'] for call in made)} requests retried after a 429")
+    for plan in records["plan"]:
+        report(f"* query plan: {plan['distinct_queries']} distinct queries out of {plan['queries']}, fetched up front in {plan['seconds']:.1f} seconds")
+    downloads = collections.Counter(download["outcome"] for download in records["image_download"])
+    if downloads: report(f"* {downloads['downloaded']} images downloaded ({sum(download['bytes'] for download in records['image_download']) / 1048576:.1f} MB), {downloads['already there']} already there, {downloads['failed']} failed")
+    for run in records["run"]:
+        report(f"* whole run: {run['seconds']:.1f} seconds, {run['images_found']} images found")
+
+
+def summarize_stages(records, report):     #where the song-seconds went, stage by stage
+    stages = collections.Counter()
+    for song in records["song"]: stages.update(song["stages"])
+    total = sum(song["seconds"] for song in records["song"])
+    report("\nWHERE SONG TIME GOES (summed over every song):")
+    for stage, seconds in stages.most_common():
+        report(f"    {stage:<16} {seconds:>10.2f}s  {percent(seconds, total):>4}")
+    waiting = total - sum(stages.values())
+    report(f"    {'(other)':<16} {waiting:>10.2f}s  {percent(waiting, total):>4}     i.e. waiting for earlier songs to finish first, & parsing")
+
+
+def summarize_songs(records, report, top):
+    report(f"\nSLOWEST {top} SONGS:")
+    report(f"    {'seconds':>8} {'api':>5} {'cached':>6} {'throttle':>8} {'basket':>6} {'score':>5} {'pass':>4}  song  [slowest stages]")
+    for song in sorted(records["song"], key=lambda song: song["seconds"], reverse=True)[:top]:
+        stages = ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in sorted(song["stages"].items(), key=lambda item: item[1], reverse=True)[:3])
+        report(f"    {song['seconds']:>8.2f} {song.get('api_calls', 0):>5} {song.get('cache_hits', 0):>6} {song.get('throttle_seconds', 0):>7.1f}s {song.get('basket_size', '-'):>6} "
+               f"{score_text(song.get('score')):>5} {str(song.get('found_on_pass') or '-'):>4}  {song['song']}  [{stages}]")
+
+
+def summarize_queries(records, report, top):   #the same query is often asked by several songs, so these are totals per distinct query
+    queries = collections.OrderedDict()
+    for query in records["query"]:
+        totals = queries.setdefault(query_text(query["params"]), collections.Counter())
+        totals.update(asked=1, pages_fetched=query["pages_fetched"], pages_from_cache=query["pages_from_cache"], pages_skipped=query["pages_skipped"])
+        totals["seconds"] += query["seconds"]
+    report(f"\nMOST EXPENSIVE {top} QUERIES (by API calls made, then by time):")
+    report(f"    {'fetched':>7} {'cached':>6} {'skipped':>7} {'asked':>5} {'seconds':>8}  query")
+    for text, totals in sorted(queries.items(), key=lambda item: (item[1]["pages_fetched"], item[1]["seconds"]), reverse=True)[:top]:
+        report(f"    {totals['pages_fetched']:>7} {totals['pages_from_cache']:>6} {totals['pages_skipped']:>7} {totals['asked']:>5} {totals['seconds']:>8.2f}  {text}")
+
+
+def summarize(records, top=10, report=print):
+    summarize_run(records, report)
+    if records["song"]:
+        summarize_stages(records, report)
+        summarize_songs(records, report, top)
+    if records["query"]:
+        summarize_queries(records, report, top)
+
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarizes the trace that cover_downloader.py writes when TRACE_RUN is on.")
+    parser.add_argument("trace", nargs="?", default=DEFAULT_TRACE_FILE, help=f"the trace to summarize (default: {DEFAULT_TRACE_FILE})")
+    parser.add_argument("--top", type=int, default=10, help="how many of the slowest songs & most expensive queries to list (default: 10)")
+    args = parser.parse_args()
+
+    summarize(load_trace(args.trace), args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
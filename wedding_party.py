@@ -1,7 +1,8 @@
 import os
 import shutil
 import builtins
-from cover_downloader import does_companion_exist, original_print, primt
+from cover_downloader import original_print, primt
+from companion_index import CompanionIndex
 from colorama import Fore, Style, init
 init()
 
@@ -14,21 +15,21 @@ if not os.path.exists("married"):
 losers        = 0
 couples_moved = 0
 total_potential_couples = 0
+moved = set()                                                   #a file can be family to more than one song (i.e. "SongA.mp3" to "Song.mp3"), but can only move once
+index = CompanionIndex(".")                                     #one scan of the folder, instead of checking thousands of possible filenames per song
 original_print()
-for file in os.listdir("."):
+for file in index.audio_files():
     if not (file.endswith(".mp3") or file.endswith(".flac")):
         continue
-    filepath = os.path.join(".", file)
-    if does_companion_exist(filepath):
-        base_filename = os.path.splitext(file)[0]
-        possible_filenames = [f"{base_filename}{suffix}" for suffix in ["", "A", "B"] + [f"B{i}" for i in range(1, 1000)]]
-        possible_extensions = [".mp3", ".flac"] + [f"{ext}" for ext in [".jpg.jpg", ".jpg", ".jpeg", ".png", ".webp"]]
-        possible_files = [f"{filename}{extension}" for filename in possible_filenames for extension in possible_extensions]
-        for possible_file in possible_files:
-            if os.path.isfile(os.path.join(".", possible_file)):
-                new_root = os.path.join("married")
-                os.makedirs(new_root, exist_ok=True)
-                shutil.move(os.path.join(".", possible_file), os.path.join(new_root, possible_file))
+    if file in moved:
+        continue
+    if index.has_companion(file):
+        for possible_file in index.family(file):
+            if possible_file in moved: continue
+            new_root = os.path.join("married")
+            os.makedirs(new_root, exist_ok=True)
+            shutil.move(os.path.join(".", possible_file), os.path.join(new_root, possible_file))
+            moved.add(possible_file)
         original_print(f"{Fore.GREEN}{Style.BRIGHT}{file} and its companions moved to married directory.")
         total_potential_couples += 1
         couples_moved += 1